@@ -4,14 +4,35 @@ Main entry point for the Google ADK Agent.
 """
 
 import sys
-from src.core.mcp_agent import async_main
-import asyncio
+
+# Start profiling before anything heavy is imported
+if any(arg.startswith("--profile-startup") for arg in sys.argv[1:]):
+    from src.core.startup_profiler import start_startup_profiler
+    start_startup_profiler(capture_imports="--profile-imports" in sys.argv[1:])
+
+from src.core.startup_profiler import profile_phase, get_startup_profiler
 
 if __name__ == "__main__":
+    # Parse arguments (and handle --help or bad flags) before loading the ADK stack
+    with profile_phase("cli"):
+        from src.core.cli import parse_args, CLI_IMPORT_BUDGET_SECONDS, HEAVY_MODULES
+        args = parse_args()
+
+    profiler = get_startup_profiler()
+    if profiler:
+        profiler.set_budget("cli", CLI_IMPORT_BUDGET_SECONDS)
+        heavy_loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        if heavy_loaded:
+            profiler.note(f"Heavy modules imported before argument parsing: {', '.join(heavy_loaded)}")
+
+    import asyncio
+    with profile_phase("imports"):
+        from src.core.mcp_agent import async_main
+
     try:
-        asyncio.run(async_main())
+        asyncio.run(async_main(args))
     except KeyboardInterrupt:
         print("\nAgent interrupted by user. Goodbye!")
     except Exception as e:
         print(f"An error occurred: {e}")
-        print("The agent will restart automatically. Please try your request again.")
\ No newline at end of file
+        print("The agent will restart automatically. Please try your request again.")
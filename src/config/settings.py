@@ -3,7 +3,8 @@ Centralized configuration management for Google ADK Agent.
 Uses environment variables and provides validation.
 """
 import os
-from typing import Dict, Optional, Any
+import shutil
+from typing import Dict, Optional
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -37,6 +38,24 @@ class PathConfig:
         for dir_path in [self.data_dir, self.agent_files_dir, self.conversation_exports_dir]:
             dir_path.mkdir(parents=True, exist_ok=True)
 
+# Default time a single MCP server may take to spawn and answer its tool listing
+DEFAULT_SERVER_TIMEOUT = 30.0
+
+# Supported values for the startup_mode of initialize_all_mcp_servers
+STARTUP_MODES = ("concurrent", "sequential", "lazy")
+
+# Root of the repository, used to resolve project-relative server paths
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# Named groups of MCP servers; None selects every configured server
+MCP_PROFILES: Dict[str, Optional[tuple]] = {
+    "minimal": ("filesystem", "code_executor"),
+    "news": ("content_scraper", "fetch", "telegram"),
+    "research": ("perplexity", "gemini_research", "fetch", "filesystem"),
+    "full": None,
+}
+DEFAULT_MCP_PROFILE = "full"
+
 @dataclass
 class MCPServerConfig:
     """Configuration for an MCP server."""
@@ -45,6 +64,28 @@ class MCPServerConfig:
     args: list = field(default_factory=list)
     env: Dict[str, str] = field(default_factory=dict)
     working_dir: Optional[str] = None
+    display_name: Optional[str] = None
+    required_env: list = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.display_name is None:
+            self.display_name = f"{self.name}_server"
+
+    def missing_requirements(self) -> list[str]:
+        """Return the reasons this server cannot be spawned (empty if it can)."""
+        missing = []
+        if shutil.which(self.command) is None:
+            missing.append(f"command '{self.command}' not found")
+        for arg in self.args:
+            if os.path.isabs(str(arg)) and not os.path.exists(arg):
+                missing.append(f"{arg} does not exist")
+        if self.working_dir and not os.path.isdir(self.working_dir):
+            missing.append(f"working directory {self.working_dir} does not exist")
+        # A stdio server only sees the variables passed in env, not our environment
+        for var in self.required_env:
+            if not self.env.get(var):
+                missing.append(f"{var} is not set")
+        return missing
 
 @dataclass
 class AgentConfig:
@@ -52,6 +93,7 @@ class AgentConfig:
     model: ModelConfig = field(default_factory=ModelConfig)
     paths: PathConfig = field(default_factory=PathConfig)
     mcp_servers: Dict[str, MCPServerConfig] = field(default_factory=dict)
+    mcp_profile: str = DEFAULT_MCP_PROFILE
     
     # Feature flags
     enable_error_recovery: bool = True
@@ -81,39 +123,86 @@ class AgentConfig:
         config.enable_proactive_suggestions = os.getenv("ADK_ENABLE_PROACTIVE_SUGGESTIONS", "false").lower() == "true"
         
         # MCP servers configuration
+        config.mcp_profile = os.getenv("ADK_MCP_PROFILE", DEFAULT_MCP_PROFILE)
         config._load_mcp_servers()
         
         return config
     
     def _load_mcp_servers(self):
         """Load MCP server configurations."""
-        # Default MCP servers - these should be loaded from a config file or env
+        # Script locations can be overridden per server through the environment
+        mcp_dir = os.getenv("ADK_MCP_SERVERS_DIR", "/Users/milanboonstra/Documents/Cline/MCP")
+        code_executor_script = os.getenv(
+            "ADK_CODE_EXECUTOR_MCP_PATH",
+            "/Users/milanboonstra/code/openaisdkmcp_server_copy/mcp_code_executor/build/index.js"
+        )
+        gemini_research_dir = os.getenv("ADK_GEMINI_RESEARCH_MCP_DIR", "/Users/milanboonstra/code/gemini-research-agent-mcp")
+        agent_files_dir = str(PROJECT_ROOT / "data" / "agent_files")
+
         self.mcp_servers = {
             "filesystem": MCPServerConfig(
                 name="filesystem",
                 command="npx",
-                args=["-y", "@modelcontextprotocol/server-filesystem"],
-                working_dir=str(Path.home() / "dev")
+                args=["-y", "@modelcontextprotocol/server-filesystem", agent_files_dir]
             ),
-            "docs": MCPServerConfig(
-                name="docs",
-                command="npx",
-                args=["-y", "@arabold/docs-mcp-server@latest"],
+            "code_executor": MCPServerConfig(
+                name="code_executor",
+                command="node",
+                args=[code_executor_script],
                 env={
-                    "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", ""),
-                    "DOCS_STORAGE_PATH": str(self.paths.base_dir / "indexed-docs")
+                    "CODE_STORAGE_DIR": agent_files_dir,
+                    "ENV_TYPE": "venv",
+                    "VENV_PATH": os.path.join(os.getcwd(), ".mcp_venv")
                 }
             ),
+            "content_scraper": MCPServerConfig(
+                name="content_scraper",
+                command="node",
+                args=[os.path.join(mcp_dir, "contentscraper-mcp-server", "build", "index.js")]
+            ),
+            "fetch": MCPServerConfig(
+                name="fetch",
+                command="node",
+                args=[os.path.join(mcp_dir, "fetch-server", "build", "index.js")]
+            ),
+            "perplexity": MCPServerConfig(
+                name="perplexity",
+                command="node",
+                args=[os.path.join(mcp_dir, "perplexity-mcp", "build", "index.js")],
+                env={"PERPLEXITY_API_KEY": os.getenv("PERPLEXITY_API_KEY", "")},
+                required_env=["PERPLEXITY_API_KEY"]
+            ),
             "telegram": MCPServerConfig(
                 name="telegram",
-                command="python",
-                args=[str(Path(__file__).parent.parent / "mcp" / "telegram_mcp_server.py")],
+                command="node",
+                args=[os.path.join(mcp_dir, "telegram-server", "build", "index.js")],
                 env={
                     "TELEGRAM_BOT_TOKEN": os.getenv("TELEGRAM_BOT_TOKEN", ""),
-                    "TELEGRAM_CHAT_ID": os.getenv("TELEGRAM_CHAT_ID", "")
-                }
+                    "DEFAULT_CHAT_ID": os.getenv("DEFAULT_CHAT_ID", "")
+                },
+                required_env=["TELEGRAM_BOT_TOKEN", "DEFAULT_CHAT_ID"]
+            ),
+            "gemini_research": MCPServerConfig(
+                name="gemini_research",
+                command="node",
+                args=["--enable-source-maps", os.path.join(gemini_research_dir, "dist", "index.js")],
+                env={"GEMINI_API_KEY": os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY", "")},
+                working_dir=gemini_research_dir,
+                display_name="gemini_research_agent",
+                required_env=["GEMINI_API_KEY"]
             )
         }
+
+    def servers_for_profile(self, profile: Optional[str] = None) -> Dict[str, MCPServerConfig]:
+        """Return the configured MCP servers that belong to a profile, in registry order."""
+        profile = profile or self.mcp_profile
+        if profile not in MCP_PROFILES:
+            raise ValueError(f"Unknown MCP profile '{profile}'. Choose from: {', '.join(MCP_PROFILES)}")
+        names = MCP_PROFILES[profile]
+        return {
+            name: server for name, server in self.mcp_servers.items()
+            if names is None or name in names
+        }
     
     def validate(self) -> list[str]:
         """Validate configuration and return list of warnings."""
@@ -128,10 +217,9 @@ class AgentConfig:
         
         # Check MCP server requirements
         for name, server in self.mcp_servers.items():
-            if name == "telegram" and not server.env.get("TELEGRAM_BOT_TOKEN"):
-                warnings.append(f"Telegram MCP server configured but TELEGRAM_BOT_TOKEN not set")
-            elif name == "docs" and not server.env.get("OPENAI_API_KEY"):
-                warnings.append(f"Docs MCP server configured but OPENAI_API_KEY not set")
+            for var in server.required_env:
+                if not server.env.get(var):
+                    warnings.append(f"{name} MCP server configured but {var} not set")
         
         return warnings
 
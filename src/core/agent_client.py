@@ -0,0 +1,66 @@
+"""
+Thin AgentSH client that forwards a query to a running agent daemon.
+
+This module only uses the standard library so it starts in milliseconds.
+Run it as `python -m src.core.agent_client <query...>`. It exits with
+EXIT_NO_DAEMON when no daemon is listening, so the caller can fall back
+to a cold start of main.py.
+"""
+
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# Exit status used to tell the `agent` wrapper to fall back to a cold start
+EXIT_NO_DAEMON = 3
+
+
+def get_socket_path() -> str:
+    """Return the Unix domain socket path shared by the daemon and its clients."""
+    default_path = os.path.join(tempfile.gettempdir(), f"agentsh-{os.getuid()}.sock")
+    return os.getenv("AGENTSH_SOCKET", default_path)
+
+
+def send_query(query: str, socket_path: str = None, output=None) -> int:
+    """
+    Send a query to the daemon and stream its output as it arrives.
+
+    Returns 0 on success, or EXIT_NO_DAEMON if no daemon accepted the connection.
+    """
+    socket_path = socket_path or get_socket_path()
+    output = output or sys.stdout.buffer
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return EXIT_NO_DAEMON
+
+    with client:
+        request = json.dumps({"query": query}) + "\n"
+        client.sendall(request.encode("utf-8"))
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            output.write(data)
+            output.flush()
+    return 0
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python -m src.core.agent_client <query>", file=sys.stderr)
+        return 2
+    try:
+        return send_query(" ".join(argv))
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Long-lived AgentSH daemon that answers queries over a Unix domain socket.
+
+The daemon keeps the imported ADK stack, the warm MCP servers and the built
+agents alive between queries. Each client connection sends a single JSON line
+({"query": "..."}) and receives the shell-mode output of that query as it is
+written, after which the connection is closed.
+
+Queries run concurrently. Their output is routed per task (see
+output_router), so each client only receives what its own query prints and
+everything else goes to the daemon's own stdout/stderr.
+"""
+
+import asyncio
+import io
+import json
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Optional
+
+from ..utils.mcp_agent_utils import print_status_message
+from ..utils.output_router import install_output_router, redirect_output
+from .agent_client import get_socket_path
+
+
+class _SocketOutput(io.TextIOBase):
+    """Text stream that forwards everything written to a client connection."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self._writer = writer
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if not self._writer.is_closing():
+            self._writer.write(text.encode("utf-8"))
+        return len(text)
+
+    def isatty(self) -> bool:
+        return False
+
+    async def drain(self):
+        """Wait until the client has taken up the output written so far."""
+        if self._writer.is_closing():
+            return
+        try:
+            await self._writer.drain()
+        except ConnectionError:
+            # Client went away; further output is dropped by write()
+            pass
+
+
+class AgentDaemon:
+    """Serves AgentSH queries from a single warm agent process."""
+
+    def __init__(self, handle_query: Callable[[str], Awaitable[None]], socket_path: Optional[str] = None):
+        """
+        Args:
+            handle_query: Coroutine function that runs one query and prints its output
+            socket_path: Unix domain socket to listen on (defaults to get_socket_path())
+        """
+        self.handle_query = handle_query
+        self.socket_path = socket_path or get_socket_path()
+        self.queries_served = 0
+
+    async def serve_forever(self):
+        """Listen on the socket until the daemon is cancelled or interrupted."""
+        self._remove_stale_socket()
+        # Each query's prints go to its own client
+        install_output_router()
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        print_status_message(f"AgentSH daemon listening on {self.socket_path}", "success", show_time=False)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _remove_stale_socket(self):
+        """Remove a socket file left behind by a daemon that is no longer running."""
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(self.socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"Another AgentSH daemon is already listening on {self.socket_path}")
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Run the query sent by one client and stream its output back."""
+        try:
+            request_line = await reader.readline()
+            try:
+                query = json.loads(request_line or b"{}").get("query", "").strip()
+            except (json.JSONDecodeError, AttributeError):
+                query = ""
+            if not query:
+                writer.write(b"Error: no query received\n")
+                return
+
+            start_time = time.monotonic()
+            output = _SocketOutput(writer)
+            with redirect_output(output, output):
+                try:
+                    await self.handle_query(query)
+                except Exception as e:
+                    print(f"An error occurred: {e}")
+            self.queries_served += 1
+            print_status_message(f"Served query {self.queries_served} in {time.monotonic() - start_time:.1f}s", "info")
+            await writer.drain()
+        except ConnectionError:
+            # Client went away mid-response; nothing left to deliver
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
@@ -0,0 +1,258 @@
+"""
+Command-line interface definition for the Google ADK agent.
+
+Argument parsing, --help and slash-command metadata live here so they load
+without importing google.adk, google.genai, litellm or tiktoken. Only the
+standard library and the stdlib-only startup profiler are imported.
+"""
+
+import argparse
+from typing import List, Optional
+
+from ..config.settings import DEFAULT_SERVER_TIMEOUT, MCP_PROFILES, STARTUP_MODES
+from .startup_profiler import start_startup_profiler
+
+# Import-time budget for this module plus argument parsing (see --profile-startup)
+CLI_IMPORT_BUDGET_SECONDS = 0.25
+
+# Modules that must not be imported just to parse arguments or show --help
+HEAVY_MODULES = ("google.adk", "google.genai", "litellm", "tiktoken")
+
+# Available slash commands
+SLASH_COMMANDS = {
+    '/save': 'Save the current conversation to a markdown file',
+    '/exit': 'Exit the agent',
+    '/help': 'Show available commands',
+    '/stats': 'Show conversation statistics',
+    '/clear': 'Clear the conversation history (start fresh)',
+    '/servers': 'Show MCP server health',
+    '/budget': 'Show token spending of the last request',
+    '/tools': 'Show call counts and latency per tool',
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(description="Run ADK Agent with selectable LLM provider and model.")
+    parser.add_argument(
+        "--llm_provider",
+        type=str,
+        default="gemini",
+        choices=["gemini", "openrouter"],
+        help="The LLM provider to use ('gemini' or 'openrouter'). Default is 'gemini'."
+    )
+    parser.add_argument(
+        "--model_name",
+        type=str,
+        default="gemini-2.5-flash-preview-05-20",
+        help="The model name to use. For Gemini, e.g., 'gemini-2.5-flash-preview-05-20'. For OpenRouter, e.g., 'openrouter/anthropic/claude-3-haiku'. Ensure OPENROUTER_API_KEY is set in .env if using OpenRouter."
+    )
+    parser.add_argument(
+        "-q", "--query",
+        type=str,
+        nargs='+',
+        help="Direct query to send to the agent (non-interactive mode)"
+    )
+    parser.add_argument(
+        "-m", "--model",
+        type=str,
+        dest="model_name_short",
+        help="Shorthand for --model_name"
+    )
+    parser.add_argument(
+        "--shell-mode",
+        action="store_true",
+        help="Enable simplified shell mode UI (used by AgentSH)"
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run as a long-lived AgentSH daemon that answers queries over a Unix domain socket"
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Unix domain socket path for --daemon (defaults to $AGENTSH_SOCKET or a per-user temp path)"
+    )
+    parser.add_argument(
+        "--mcp-startup",
+        type=str,
+        default=None,
+        choices=list(STARTUP_MODES),
+        help="How MCP servers are started: all at once ('concurrent'), one after another ('sequential') or on first use by their agent ('lazy'). Default is 'lazy' for direct queries and 'concurrent' otherwise."
+    )
+    parser.add_argument(
+        "--mcp-profile",
+        type=str,
+        default=None,
+        choices=list(MCP_PROFILES),
+        help="Named group of MCP servers to start: 'minimal', 'news', 'research' or 'full'. Defaults to $ADK_MCP_PROFILE or 'full'."
+    )
+    parser.add_argument(
+        "--mcp-timeout",
+        type=float,
+        default=DEFAULT_SERVER_TIMEOUT,
+        help=f"Seconds each MCP server may take to become ready, at startup or when first used. Default is {DEFAULT_SERVER_TIMEOUT:.0f}."
+    )
+    parser.add_argument(
+        "--mcp-pool-size",
+        type=int,
+        default=1,
+        help="Subprocesses to keep per MCP server so parallel tool calls from different requests do not queue behind one connection. Default is 1."
+    )
+    parser.add_argument(
+        "--mcp-pool-concurrency",
+        type=int,
+        default=1,
+        help="Tool calls that may run at once on one pooled MCP subprocess. Default is 1."
+    )
+    parser.add_argument(
+        "--no-tool-cache",
+        action="store_true",
+        help="Always do the full MCP handshake instead of starting agents from cached tool schemas (data/mcp_tool_cache/)"
+    )
+    parser.add_argument(
+        "--mcp-probe-interval",
+        type=float,
+        default=30.0,
+        help="Seconds between MCP server health probes in interactive and daemon mode (0 disables supervision). Default is 30."
+    )
+    parser.add_argument(
+        "--token-counter",
+        type=str,
+        default="tiktoken",
+        choices=["tiktoken", "gemini"],
+        help="Backend for exact token counts near the context limit: tiktoken's gpt-4 encoding or the Gemini count_tokens API. Default is 'tiktoken'."
+    )
+    parser.add_argument(
+        "--token-escalation-band",
+        type=float,
+        default=0.1,
+        help="Fraction of the context limit within which estimated token counts are replaced by exact ones. Default is 0.1. Estimates of code and logs can be up to 2x low; use about 0.5 for such inputs."
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=None,
+        help="Token budget for the session context resent every turn; older turns are dropped and consumed tool results shortened to stay under it. Defaults to the model's context limit."
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Print each response only once it is complete instead of streaming it as it is generated."
+    )
+    parser.add_argument(
+        "--request-token-budget",
+        type=int,
+        default=1000000,
+        help="Tokens one request may spend across the root agent and all sub-agents before further model calls are refused; inputs split into chunks get it once per chunk. Default is 1000000; 0 disables the limit."
+    )
+    parser.add_argument(
+        "--request-token-warning",
+        type=int,
+        default=250000,
+        help="Tokens after which a request prints a warning with its per-agent spending. Default is 250000; 0 disables the warning."
+    )
+    parser.add_argument(
+        "--sub-agent-token-budget",
+        type=int,
+        default=400000,
+        help="Tokens a single sub-agent may spend within one request. Default is 400000; 0 disables the limit."
+    )
+    parser.add_argument(
+        "--chunk-mode",
+        type=str,
+        choices=["map-reduce", "sequential"],
+        default="map-reduce",
+        help="How inputs larger than the context limit are processed: 'map-reduce' analyzes the chunks in parallel, temporary sessions and combines the results, 'sequential' sends them one after another to the conversation. Default is 'map-reduce'."
+    )
+    parser.add_argument(
+        "--chunk-concurrency",
+        type=int,
+        default=4,
+        help="Chunks analyzed at the same time in map-reduce mode. Default is 4."
+    )
+    parser.add_argument(
+        "--summarize-threshold",
+        type=int,
+        default=32000,
+        help="Once the session context passes this many tokens, the oldest turns are summarized by the model in the background. Default is 32000; 0 disables summarization."
+    )
+    parser.add_argument(
+        "--summarize-turns",
+        type=int,
+        default=4,
+        help="Number of oldest turns folded into the summary per pass. Default is 4."
+    )
+    parser.add_argument(
+        "--record-events",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Append the runner's events of every turn to a JSONL recording at PATH, for replay with --replay-events"
+    )
+    parser.add_argument(
+        "--replay-events",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Replay a recording through the event processing pipeline and print its throughput, without models or MCP servers"
+    )
+    parser.add_argument(
+        "--replay-timing",
+        type=str,
+        choices=["fast", "original"],
+        default="fast",
+        help="Replay events as fast as they are processed ('fast', default) or at their recorded offsets ('original')"
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="With --replay-timing original, play the recording this many times faster. Default is 1.0."
+    )
+    parser.add_argument(
+        "--replay-repeat",
+        type=int,
+        default=1,
+        help="Number of times each recorded turn is replayed. Default is 1."
+    )
+    parser.add_argument(
+        "--profile-startup",
+        type=str,
+        nargs='?',
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Time each startup phase and write a JSON report (to PATH, or data/startup_profiles/) plus a summary table"
+    )
+    parser.add_argument(
+        "--profile-imports",
+        action="store_true",
+        help="With --profile-startup, also record per-module import times"
+    )
+    return parser
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse and normalize the command-line arguments."""
+    args = build_parser().parse_args(argv)
+
+    # main.py starts the profiler before parsing; cover direct runs too
+    if args.profile_startup is not None:
+        start_startup_profiler(capture_imports=args.profile_imports)
+
+    # Handle shorthand model flag
+    if args.model_name_short:
+        args.model_name = args.model_name_short
+
+    # Join query parts if provided as multiple arguments
+    if args.query:
+        args.query = ' '.join(args.query)
+
+    # One-shot queries usually reach only one or two agents, so only spawn what they use
+    if args.mcp_startup is None:
+        args.mcp_startup = "lazy" if args.query else "concurrent"
+
+    return args
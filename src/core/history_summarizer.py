@@ -0,0 +1,227 @@
+"""
+Rolling summarization of the oldest turns of an ADK session.
+
+Evicting turns (see SessionCompactor) keeps requests small but forgets what
+was said in them. Once the stored session passes a token threshold,
+HistorySummarizer asks a model to condense the oldest turns, together with
+the previous summary, into a single Content that replaces them. Facts from
+early in the session stay available while every request resends far fewer
+tokens. Summaries are produced in a background task between turns; the model
+call is any async prompt -> text callable, so it is easy to stub.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from google.adk.events.event import Event
+from google.genai import types
+
+from .session_compactor import (
+    SUMMARY_METADATA_KEY,
+    estimate_event_tokens,
+    find_turn_starts,
+    get_stored_session,
+    is_summary_event,
+)
+from .token_manager import TokenManager
+
+# Takes the summarization prompt and returns the summary text
+SummarizeFn = Callable[[str], Awaitable[str]]
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the memory of a long conversation between a user and an AI assistant "
+    "that uses tools. Merge the previous summary (if any) and the transcript below into one "
+    "concise summary. Keep every fact, name, number, file path, URL, decision and open task "
+    "the assistant may need later; drop greetings, repetition and raw tool output that was "
+    "not used. Write plain prose or bullet points, without any preamble."
+)
+
+
+@dataclass
+class SummaryResult:
+    """What a single summarization pass changed."""
+    summarized_turns: int = 0
+    replaced_events: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+
+def llm_summarize_fn(model) -> SummarizeFn:
+    """
+    Create a SummarizeFn that calls an ADK model.
+
+    Args:
+        model: A model name (e.g. a Gemini model) or an ADK BaseLlm such as LiteLlm
+    """
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.registry import LLMRegistry
+
+    llm = LLMRegistry.new_llm(model) if isinstance(model, str) else model
+
+    async def summarize(prompt: str) -> str:
+        request = LlmRequest(
+            model=llm.model,
+            contents=[types.Content(role='user', parts=[types.Part(text=prompt)])],
+        )
+        texts = []
+        async for response in llm.generate_content_async(request):
+            if response.content and response.content.parts:
+                texts.extend(part.text for part in response.content.parts if part.text and not part.thought)
+        return ''.join(texts).strip()
+
+    return summarize
+
+
+class HistorySummarizer:
+    """Replaces the oldest turns of a session with a model-written summary."""
+
+    def __init__(self, summarize_fn: SummarizeFn, token_manager: TokenManager, threshold_tokens: int,
+                 summarize_turns: int = 4, keep_recent_turns: int = 2, max_payload_chars: int = 1000):
+        """
+        Args:
+            summarize_fn: Async callable turning a prompt into summary text
+            token_manager: Used to estimate the tokens of each event
+            threshold_tokens: Summarize once the stored events exceed this many tokens
+            summarize_turns: Oldest turns folded into the summary per pass
+            keep_recent_turns: Most recent turns that are never summarized
+            max_payload_chars: Characters of each tool call or result shown to the summarizer
+        """
+        self.summarize_fn = summarize_fn
+        self.token_manager = token_manager
+        self.threshold_tokens = threshold_tokens
+        self.summarize_turns = summarize_turns
+        self.keep_recent_turns = keep_recent_turns
+        self.max_payload_chars = max_payload_chars
+        self.last_error: Optional[Exception] = None
+        self._event_tokens: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _tokens_of(self, event) -> int:
+        cached = self._event_tokens.get(event.id)
+        if cached is None:
+            cached = self._event_tokens[event.id] = estimate_event_tokens(self.token_manager, event)
+        return cached
+
+    def _clip(self, text: str) -> str:
+        if len(text) <= self.max_payload_chars:
+            return text
+        return f"{text[:self.max_payload_chars]}... [{len(text) - self.max_payload_chars} more characters]"
+
+    def _transcript(self, events) -> str:
+        lines = []
+        for event in events:
+            if not event.content or not event.content.parts:
+                continue
+            speaker = "User" if event.author == 'user' else f"Assistant ({event.author})"
+            for part in event.content.parts:
+                if part.text and not part.thought:
+                    lines.append(f"{speaker}: {part.text}")
+                elif part.function_call:
+                    args = json.dumps(part.function_call.args or {}, default=str)
+                    lines.append(f"{speaker} called {part.function_call.name}: {self._clip(args)}")
+                elif part.function_response:
+                    response = json.dumps(part.function_response.response or {}, default=str)
+                    lines.append(f"Tool {part.function_response.name} returned: {self._clip(response)}")
+        return "\n".join(lines)
+
+    def build_prompt(self, previous_summary: Optional[str], events) -> str:
+        """Build the prompt that folds events into the previous summary."""
+        sections = [SUMMARY_INSTRUCTIONS]
+        if previous_summary:
+            sections.append(f"Previous summary:\n{previous_summary}")
+        sections.append(f"Transcript:\n{self._transcript(events)}")
+        return "\n\n".join(sections)
+
+    def _plan(self, events):
+        """Return (turns, end) to summarize: events[:end] hold that many old turns, or None."""
+        total = sum(self._tokens_of(event) for event in events)
+        if total <= self.threshold_tokens:
+            return None
+        turn_starts = find_turn_starts(events)
+        summarizable = len(turn_starts) - max(self.keep_recent_turns, 0)
+        if summarizable <= 0:
+            return None
+        turns = min(self.summarize_turns, summarizable)
+        end = turn_starts[turns] if turns < len(turn_starts) else len(events)
+        return turns, end
+
+    async def summarize(self, session_service, session) -> SummaryResult:
+        """
+        Fold the oldest turns of a session into its summary if it is over the threshold.
+
+        Sessions of services that do not expose their storage are left alone.
+        """
+        result = SummaryResult()
+        storage = get_stored_session(session_service, session)
+        if storage is None:
+            return result
+        events = list(storage.events)
+        plan = self._plan(events)
+        if plan is None:
+            return result
+        turns, end = plan
+        replaced = events[:end]
+        previous = next((event for event in replaced if is_summary_event(event)), None)
+        previous_summary = previous.custom_metadata.get(SUMMARY_METADATA_KEY) if previous else None
+        prompt = self.build_prompt(previous_summary, [event for event in replaced if not is_summary_event(event)])
+
+        summary = await self.summarize_fn(prompt)
+        if not summary:
+            return result
+
+        # Only apply the summary if the summarized events are still the start of the session
+        current = list(storage.events)
+        replaced_ids = [event.id for event in replaced]
+        if [event.id for event in current[:end]] != replaced_ids:
+            return result
+
+        summary_event = Event(
+            author='user',
+            timestamp=replaced[0].timestamp,
+            content=types.Content(role='user', parts=[types.Part(text=f"{SUMMARY_PREFIX}\n{summary}")]),
+            custom_metadata={SUMMARY_METADATA_KEY: summary},
+        )
+        result.tokens_before = sum(self._tokens_of(event) for event in current)
+        for event_id in replaced_ids:
+            self._event_tokens.pop(event_id, None)
+        storage.events = [summary_event] + current[end:]
+        result.tokens_after = sum(self._tokens_of(event) for event in storage.events)
+        result.summarized_turns = turns
+        result.replaced_events = len(replaced)
+        return result
+
+    def schedule(self, session_service, session):
+        """Summarize in a background task, e.g. while the user types the next message."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.summarize(session_service, session))
+
+    async def wait(self) -> Optional[SummaryResult]:
+        """
+        Wait for the background summarization, if any, and return its result.
+
+        Call this before the next turn so the runner never appends to a session
+        that is being rewritten. Failures are kept in last_error; the turns stay
+        as they are.
+        """
+        task, self._task = self._task, None
+        if task is None:
+            return None
+        try:
+            return await task
+        except Exception as e:
+            self.last_error = e
+            return None
+
+    async def close(self):
+        """Cancel a summarization that is still running."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
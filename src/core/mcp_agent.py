@@ -1,36 +1,46 @@
 import asyncio
-from contextlib import AsyncExitStack
+from contextlib import AsyncExitStack, nullcontext
 import os
-import argparse
 from dotenv import load_dotenv
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 from google.genai import types
 import threading
 import itertools
 import time
 import sys
-import termios
-import tty
 import logging
 import warnings
 import io
+from typing import Optional
 
 # Import from our modular components
 from ..utils.mcp_agent_utils import (
     COLOR_GREEN, COLOR_YELLOW, COLOR_RESET, COLOR_CYAN, COLOR_DIM, COLOR_BOLD,
     COLOR_WHITE, SYMBOL_THINKING, SYMBOL_LOADING,
     print_section_header, print_status_message, print_session_stats, 
-    print_welcome_banner, ConversationStats
+    print_welcome_banner, print_token_budget, print_tool_latency, ConversationStats
 )
+from .history_summarizer import HistorySummarizer, llm_summarize_fn
+from .session_compactor import SessionCompactor
 from .token_manager import TokenManager
+from .tool_call_tracker import ToolCallTracker
+from .tokenizers import gemini_token_counter
 from .error_recovery_system import ErrorRecoverySystem
 from ..mcp.mcp_server_init import initialize_all_mcp_servers
+from ..mcp.tool_schema_cache import ToolSchemaCache
+from ..mcp.mcp_supervisor import MCPSupervisor
 from ..agents.agent_config import create_all_agents
+from ..processors.chunk_map_reduce import ChunkMapReducer
 from ..processors.event_processor import process_events
+from ..processors.event_recorder import EventRecorder, replay_recording
 from ..processors.conversation_logger import ConversationLogger
-from ..ui.shell_ui import ShellUI
+from ..utils.output_router import current_output, redirect_output
+from ..ui.shell_ui import InfoLineFilter, ShellUI
+from .agent_daemon import AgentDaemon
+from .startup_profiler import get_startup_profiler, profile_phase
+from .cli import SLASH_COMMANDS, parse_args
 
 # Suppress various warnings from Google ADK and MCP
 logging.getLogger('google.adk.tools.mcp_tool.mcp_session_manager').setLevel(logging.ERROR)
@@ -50,15 +60,6 @@ COLOR_BLUE = "\033[94m"
 
 # The apply_genai_content_text_patch() is called within mcp_agent_utils.py upon import.
 
-# Available slash commands
-SLASH_COMMANDS = {
-    '/save': 'Save the current conversation to a markdown file',
-    '/exit': 'Exit the agent',
-    '/help': 'Show available commands',
-    '/stats': 'Show conversation statistics',
-    '/clear': 'Clear the conversation history (start fresh)',
-}
-
 # Loading indicator class
 class LoadingIndicator:
     def __init__(self):
@@ -93,58 +94,111 @@ class LoadingIndicator:
             sys.stdout.write('\r' + ' ' * 20 + '\r')
             sys.stdout.flush()
 
-# Load environment variables from .env file
-load_dotenv()
-
-# --- Argument Parsing for Model Selection ---
-parser = argparse.ArgumentParser(description="Run ADK Agent with selectable LLM provider and model.")
-parser.add_argument(
-    "--llm_provider",
-    type=str,
-    default="gemini",
-    choices=["gemini", "openrouter"],
-    help="The LLM provider to use ('gemini' or 'openrouter'). Default is 'gemini'."
-)
-parser.add_argument(
-    "--model_name",
-    type=str,
-    default="gemini-2.5-flash-preview-05-20",
-    help="The model name to use. For Gemini, e.g., 'gemini-2.5-flash-preview-05-20'. For OpenRouter, e.g., 'openrouter/anthropic/claude-3-haiku'. Ensure OPENROUTER_API_KEY is set in .env if using OpenRouter."
-)
-parser.add_argument(
-    "-q", "--query",
-    type=str,
-    nargs='+',
-    help="Direct query to send to the agent (non-interactive mode)"
-)
-parser.add_argument(
-    "-m", "--model",
-    type=str,
-    dest="model_name_short",
-    help="Shorthand for --model_name"
-)
-parser.add_argument(
-    "--shell-mode",
-    action="store_true",
-    help="Enable simplified shell mode UI (used by AgentSH)"
-)
-args = parser.parse_args()
+# --- Direct Query Handling ---
+def warn_token_budget(budget):
+    """Soft-limit callback of request budgets: say where the tokens went."""
+    print()
+    print_status_message(f"This request has used {budget.used:,} tokens (warning at {budget.soft_limit:,})", "warning")
+    print_token_budget(budget.breakdown())
+
+
+def build_run_config(stream: bool) -> RunConfig:
+    """Run config for the root agent; with stream the runner yields partial events as text arrives."""
+    return RunConfig(streaming_mode=StreamingMode.SSE if stream else StreamingMode.NONE)
+
+
+def configure_request_budget(token_manager: TokenManager, args, agents):
+    """
+    Set the per-request token limits from the command line.
+
+    The root agent and the chunk analyst receive the user's input itself, which
+    may fill the context window, so only the request limit applies to them.
+    """
+    token_manager.set_request_budget(
+        soft_limit=args.request_token_warning, hard_limit=args.request_token_budget,
+        agent_limit=args.sub_agent_token_budget,
+        top_level_agents=(agents['root'].name, agents['chunk_analyst'].name)
+    )
+
+
+def chunked_request_count(chunk_count: int, chunk_mode: str) -> int:
+    """Requests' worth of budget for an input split into chunk_count chunks."""
+    # Map-reduce adds one call that combines the analyses of the chunks
+    return chunk_count + 1 if chunk_mode == "map-reduce" else chunk_count
 
-# Handle shorthand model flag
-if args.model_name_short:
-    args.model_name = args.model_name_short
 
-# Join query parts if provided as multiple arguments
-if args.query:
-    args.query = ' '.join(args.query)
+async def run_direct_query(query: str, runner, session, error_recovery: ErrorRecoverySystem, conversation_logger: ConversationLogger,
+                           shell_mode: bool = False, token_manager: Optional[TokenManager] = None,
+                           run_config: Optional[RunConfig] = None, tool_tracker: Optional[ToolCallTracker] = None,
+                           event_recorder: Optional[EventRecorder] = None):
+    """Run a single query through the runner and render the response."""
+    # Create conversation logger for direct query
+    conversation_logger.add_user_message(query)
+    
+    # Show enhanced UI banner if in shell mode
+    if shell_mode:
+        # Show aesthetic banner without clearing screen
+        ShellUI.print_banner()
+        ShellUI.print_processing("Processing your request")
+    
+    # Create loading indicator
+    loading_indicator = LoadingIndicator()
+    if not shell_mode:
+        loading_indicator.start()
+    # Shell mode processing is handled by ShellUI.print_processing() above
+    
+    # Create stats tracker
+    stats = ConversationStats()
+    stats.start_request()
+    
+    # Charge every model call of this query, sub-agents included, to one budget
+    budget_scope = token_manager.request_budget(on_soft_limit=warn_token_budget) if token_manager else nullcontext()
+    with budget_scope:
+        # Process the query
+        content = types.Content(role='user', parts=[types.Part(text=query)])
+        events_async = runner.run_async(
+            session_id=session.id, user_id=session.user_id, new_message=content, run_config=run_config
+        )
+        if event_recorder:
+            events_async = event_recorder.record(events_async, query)
+
+        # Process response - stream stdout/stderr in shell mode, dropping Info messages as they appear
+        if shell_mode:
+            # Only this query's output is filtered when the daemon serves several at once
+            filtered_output = InfoLineFilter(current_output())
+            with redirect_output(filtered_output, filtered_output):
+                try:
+                    await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator, shell_mode=shell_mode,
+                                         tool_tracker=tool_tracker)
+                finally:
+                    filtered_output.close_line()
+        else:
+            await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator, shell_mode=shell_mode,
+                                 tool_tracker=tool_tracker)
 
 # --- Main Execution Logic ---
-async def async_main():
+async def async_main(args=None):
+  if args is None:
+    args = parse_args()
+
+  # Benchmark the local event pipeline on a recording; no models or MCP servers needed
+  if args.replay_events:
+    await replay_recording(args.replay_events, realtime=args.replay_timing == "original",
+                           speed=args.replay_speed, repeat=args.replay_repeat, shell_mode=args.shell_mode)
+    return
+
+  # Load environment variables from .env file
+  with profile_phase("load_dotenv"):
+    load_dotenv()
+
   # Determine model configuration based on command-line arguments
   model_config_to_use = None
   if args.llm_provider == "openrouter":
     if not os.getenv("OPENROUTER_API_KEY"):
       print(f"{COLOR_YELLOW}Warning: --llm_provider is 'openrouter' but OPENROUTER_API_KEY is not set in .env. LiteLLM might fail.{COLOR_RESET}")
+    # LiteLLM is slow to import and only needed for OpenRouter models
+    with profile_phase("import litellm"):
+      from google.adk.models.lite_llm import LiteLlm
     model_config_to_use = LiteLlm(model=args.model_name)
     if not args.query:
       print_status_message(f"Using OpenRouter model: {args.model_name}", "success", show_time=False)
@@ -161,7 +215,12 @@ async def async_main():
   else:
     max_tokens = 120000  # 120K for older models or other providers
   
-  token_manager = TokenManager(model_name=args.model_name, max_context_tokens=max_tokens)
+  with profile_phase("token_manager"):
+    exact_tokenizer = gemini_token_counter(args.model_name) if args.token_counter == "gemini" else None
+    token_manager = TokenManager(model_name=args.model_name, max_context_tokens=max_tokens,
+                                 exact_tokenizer=exact_tokenizer, escalation_band=args.token_escalation_band)
+    # Parse the BPE ranks while the MCP servers start
+    token_manager.preload()
   if not args.query:
     print_status_message(f"Token manager initialized with {max_tokens:,} max context tokens", "success", show_time=False)
   
@@ -180,9 +239,10 @@ async def async_main():
   # Artifact service might not be needed for this example
   # artifacts_service = InMemoryArtifactService() # Uncomment if you need artifact service
 
-  session = await session_service.create_session(
-      state={}, app_name='mcp_filesystem_app', user_id='user_fs'
-  )
+  with profile_phase("create_session"):
+    session = await session_service.create_session(
+        state={}, app_name='mcp_filesystem_app', user_id='user_fs'
+    )
 
   # Print welcome banner only in interactive mode
   if not args.query:
@@ -191,77 +251,111 @@ async def async_main():
   # Create an AsyncExitStack to manage the lifecycle of MCPToolset
   async with AsyncExitStack() as exit_stack:
     # Initialize all MCP servers - suppress stderr in shell mode
-    if args.shell_mode:
-        # Capture stderr during MCP server initialization
-        old_stderr = sys.stderr
-        sys.stderr = io.StringIO()
-        try:
-            mcp_servers = await initialize_all_mcp_servers(error_recovery, exit_stack, quiet=True)
-        finally:
-            sys.stderr = old_stderr
-    else:
-        mcp_servers = await initialize_all_mcp_servers(error_recovery, exit_stack, quiet=args.query is not None)
+    mcp_startup_times = {}
+    schema_cache = None if args.no_tool_cache else ToolSchemaCache()
+    with profile_phase("mcp_servers"):
+        if args.shell_mode:
+            # Capture stderr during MCP server initialization
+            old_stderr = sys.stderr
+            sys.stderr = io.StringIO()
+            try:
+                mcp_servers = await initialize_all_mcp_servers(
+                    error_recovery, exit_stack, quiet=True,
+                    startup_mode=args.mcp_startup, timeout=args.mcp_timeout,
+                    startup_times=mcp_startup_times, schema_cache=schema_cache,
+                    profile=args.mcp_profile, pool_size=args.mcp_pool_size,
+                    pool_concurrency=args.mcp_pool_concurrency
+                )
+            finally:
+                sys.stderr = old_stderr
+        else:
+            mcp_servers = await initialize_all_mcp_servers(
+                error_recovery, exit_stack, quiet=args.query is not None,
+                startup_mode=args.mcp_startup, timeout=args.mcp_timeout,
+                startup_times=mcp_startup_times, schema_cache=schema_cache,
+                profile=args.mcp_profile, pool_size=args.mcp_pool_size,
+                pool_concurrency=args.mcp_pool_concurrency
+            )
 
     # Create all agents using the configuration module
-    agents = create_all_agents(model_config_to_use, mcp_servers)
+    with profile_phase("create_all_agents"):
+        tool_tracker = ToolCallTracker()
+        agents = create_all_agents(model_config_to_use, mcp_servers, token_manager, tool_tracker)
     root_agent = agents['root']
+    configure_request_budget(token_manager, args, agents)
 
-    runner = Runner(
-        app_name='mcp_filesystem_app',
-        agent=root_agent,
-        # artifact_service=artifacts_service, # Uncomment if you need artifact service
-        session_service=session_service,
-    )
+    with profile_phase("runner"):
+        runner = Runner(
+            app_name='mcp_filesystem_app',
+            agent=root_agent,
+            # artifact_service=artifacts_service, # Uncomment if you need artifact service
+            session_service=session_service,
+        )
 
-    # Handle direct query mode (non-interactive)
-    if args.query:
-        
-        # Create conversation logger for direct query
-        conversation_logger.add_user_message(args.query)
-        
-        # Show enhanced UI banner if in shell mode
-        if args.shell_mode:
-            # Show aesthetic banner without clearing screen
-            ShellUI.print_banner()
-            ShellUI.print_processing("Processing your request")
-        
-        # Create loading indicator
-        loading_indicator = LoadingIndicator()
-        if not args.shell_mode:
-            loading_indicator.start()
-        # Shell mode processing is handled by ShellUI.print_processing() above
-        
-        # Create stats tracker
-        stats = ConversationStats()
-        stats.start_request()
-        
-        # Process the query
-        content = types.Content(role='user', parts=[types.Part(text=args.query)])
-        events_async = runner.run_async(
-            session_id=session.id, user_id=session.user_id, new_message=content
+    # Stream responses token by token unless disabled
+    run_config = build_run_config(not args.no_stream)
+
+    # Record every turn's events for offline replay
+    event_recorder = None
+    if args.record_events:
+        event_recorder = EventRecorder(args.record_events)
+        exit_stack.callback(event_recorder.close)
+
+    # Startup is complete: report where the time went if profiling
+    profiler = get_startup_profiler()
+    if profiler:
+        for server_name, elapsed in mcp_startup_times.items():
+            profiler.record(f"mcp_server:{server_name}", elapsed)
+        report_path = profiler.write_report(args.profile_startup or None)
+        profiler.print_table()
+        print_status_message(f"Startup profile written to: {report_path}", "info", show_time=False)
+
+    # A failed tiktoken load is permanent; say so instead of silently estimating
+    if token_manager.tiktoken.failed and not args.shell_mode:
+        print_status_message(
+            f"Exact token counting is unavailable ({token_manager.tiktoken.load_error}); token counts are estimates. "
+            "Run 'python -m src.core.tokenizers' once with network access to seed the cache.",
+            "warning", show_time=False
         )
-        
-        # Process response - suppress stdout/stderr in shell mode to hide Info messages
-        if args.shell_mode:
-            old_stdout = sys.stdout
-            old_stderr = sys.stderr
-            captured_output = io.StringIO()
-            sys.stdout = captured_output
-            sys.stderr = captured_output
+
+    # Keep MCP servers alive in long-running sessions
+    supervisor = None
+    if (args.daemon or not args.query) and args.mcp_probe_interval > 0:
+        supervisor = MCPSupervisor(
+            mcp_servers, probe_interval=args.mcp_probe_interval,
+            probe_timeout=min(args.mcp_timeout, 10.0), restart_timeout=args.mcp_timeout,
+            # The daemon's own log, never a client's connection
+            quiet=not args.daemon, output=sys.__stderr__ if args.daemon else None
+        )
+        supervisor.start()
+        exit_stack.push_async_callback(supervisor.stop)
+
+    # Serve queries from AgentSH clients until interrupted
+    if args.daemon:
+        async def handle_daemon_query(query: str):
+            query_session = await session_service.create_session(
+                state={}, app_name='mcp_filesystem_app', user_id='user_fs'
+            )
+            query_logger = ConversationLogger()
+            query_logger.set_model_info(args.llm_provider, args.model_name)
             try:
-                await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator, shell_mode=args.shell_mode)
+                await run_direct_query(query, runner, query_session, error_recovery, query_logger, shell_mode=True,
+                                       token_manager=token_manager, run_config=run_config,
+                                       tool_tracker=tool_tracker, event_recorder=event_recorder)
             finally:
-                # Restore stdout/stderr
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-                # Print only the main response content, filtering out Info messages
-                output = captured_output.getvalue()
-                lines = output.split('\n')
-                filtered_lines = [line for line in lines if not line.strip().startswith('Info:')]
-                if filtered_lines:
-                    print('\n'.join(filtered_lines))
-        else:
-            await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator, shell_mode=args.shell_mode)
+                # The daemon runs for days; drop each query's session once answered
+                await session_service.delete_session(
+                    app_name='mcp_filesystem_app', user_id='user_fs', session_id=query_session.id
+                )
+
+        await AgentDaemon(handle_daemon_query, socket_path=args.socket).serve_forever()
+        return
+
+    # Handle direct query mode (non-interactive)
+    if args.query:
+        await run_direct_query(args.query, runner, session, error_recovery, conversation_logger, shell_mode=args.shell_mode,
+                               token_manager=token_manager, run_config=run_config,
+                               tool_tracker=tool_tracker, event_recorder=event_recorder)
         
         # In shell mode, suppress any remaining output during cleanup
         if args.shell_mode:
@@ -286,9 +380,76 @@ async def async_main():
     conversation_history = []
     stats = ConversationStats()
     loading_indicator = LoadingIndicator()
+    # Keeps the events the runner resends every turn under the context budget
+    context_budget = args.context_budget or (token_manager.max_context_tokens - token_manager.safety_margin)
+    session_compactor = SessionCompactor(token_manager, context_budget)
+
+    # Folds the oldest turns into a summary once the session passes the threshold
+    history_summarizer = None
+    if args.summarize_threshold > 0:
+      history_summarizer = HistorySummarizer(
+        llm_summarize_fn(model_config_to_use), token_manager, args.summarize_threshold,
+        summarize_turns=args.summarize_turns
+      )
+      exit_stack.push_async_callback(history_summarizer.close)
+
+    async def compact_session():
+      result = await session_compactor.compact(session_service, session)
+      if result.evicted_turns:
+        print_status_message(
+          f"Compacted session context: dropped {result.evicted_turns} old turn(s), "
+          f"~{result.tokens_before:,} -> ~{result.tokens_after:,} tokens", "info"
+        )
+      # Summarize while the user types the next message
+      if history_summarizer:
+        history_summarizer.schedule(session_service, session)
+
+    async def apply_summary():
+      # The runner must not append to the session while it is being rewritten
+      if history_summarizer is None:
+        return
+      result = await history_summarizer.wait()
+      if result and result.summarized_turns:
+        print_status_message(
+          f"Summarized {result.summarized_turns} older turn(s) into session memory, "
+          f"~{result.tokens_before:,} -> ~{result.tokens_after:,} tokens", "info"
+        )
     
+    def report_budget(budget):
+      if budget.stopped:
+        print_status_message("Token budget reached, some model calls were skipped:", "warning")
+        print_token_budget(budget.breakdown())
+      if budget.warned or budget.stopped:
+        conversation_logger.add_metadata({"type": "token_budget", **budget.breakdown()})
+
+    def report_chunk_progress(result, completed, total):
+      if result.error:
+        print_status_message(f"Chunk {result.index + 1}/{total} failed after {result.elapsed:.1f}s: {result.error}", "warning")
+      else:
+        print_status_message(f"Chunk {result.index + 1}/{total} analyzed in {result.elapsed:.1f}s ({completed}/{total} done)", "info")
+
+    def start_run(content):
+      events_async = runner.run_async(
+        session_id=session.id, user_id=session.user_id, new_message=content, run_config=run_config
+      )
+      if event_recorder:
+        events_async = event_recorder.record(events_async, user_input)
+      return events_async
+
+    # Analyzes the chunks of oversized inputs in parallel, throwaway sessions of a
+    # tool-less agent, so the input's text can never trigger tools
+    chunk_runner = Runner(
+      app_name='mcp_filesystem_app_chunks', agent=agents['chunk_analyst'], session_service=InMemorySessionService()
+    )
+    chunk_map_reducer = ChunkMapReducer(
+      chunk_runner, session.user_id,
+      max_concurrency=args.chunk_concurrency, on_progress=report_chunk_progress
+    )
+
     # Function to get single character input
     def get_char():
+        import termios
+        import tty
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
         try:
@@ -380,7 +541,9 @@ async def async_main():
       
       # Custom input handling for slash command autocomplete
       while True:
-        char = get_char()
+        # Read keys off the event loop, so background work (the history
+        # summary) runs while the user types
+        char = await asyncio.to_thread(get_char)
         
         if ord(char) == 13:  # Enter key
           # Clear any command suggestions before printing newline
@@ -442,8 +605,30 @@ async def async_main():
           print()
           continue
         
+        elif command == '/servers':
+          if supervisor:
+            supervisor.print_status()
+          else:
+            print_status_message("MCP server supervision is disabled (--mcp-probe-interval 0).", "info")
+            print()
+          continue
+        
+        elif command == '/budget':
+          if token_manager.last_budget:
+            print_token_budget(token_manager.last_budget.breakdown())
+          else:
+            print_status_message("No request has been made yet.", "info")
+          print()
+          continue
+        
+        elif command == '/tools':
+          print_tool_latency(tool_tracker.latency_stats())
+          print()
+          continue
+        
         elif command == '/clear':
           conversation_history = []
+          token_manager.reset_history()
           conversation_logger.clear()
           print_status_message("Conversation history cleared.", "success")
           print()
@@ -457,55 +642,92 @@ async def async_main():
       # Log user message
       conversation_logger.add_user_message(user_input)
       
-      # Start timing the request
-      stats.start_request()
-      
-      # Start loading indicator
-      loading_indicator.start()
-
-      # Check if user input is too large and split if necessary
-      input_tokens = token_manager.count_tokens(user_input)
-      if input_tokens > token_manager.max_context_tokens - token_manager.safety_margin:
-        print_status_message(f"Input is very large ({input_tokens:,} tokens). Splitting into chunks...", "warning")
-        chunks = token_manager.split_large_message(user_input)
-        
-        for i, chunk in enumerate(chunks):
-          print_status_message(f"Processing chunk {i+1}/{len(chunks)}...", "info")
-          content = types.Content(role='user', parts=[types.Part(text=chunk)])
-          conversation_history.append(content)
-          
+      # Charge every model call of this turn, sub-agents included, to one budget
+      with token_manager.request_budget(on_soft_limit=warn_token_budget) as budget:
+        # Start timing the request
+        stats.start_request()
+
+        # Start loading indicator
+        loading_indicator.start()
+
+        # Check if user input is too large and split if necessary
+        input_limit = token_manager.max_context_tokens - token_manager.safety_margin
+        input_tokens = await token_manager.count_tokens_for_limit_async(user_input, input_limit)
+        if input_tokens > input_limit:
+          print_status_message(f"Input is very large ({input_tokens:,} tokens). Splitting into chunks...", "warning")
+          chunk_tokens = input_limit
+          if args.chunk_mode == "map-reduce":
+            # Every chunk is sent with the analyst's instruction and the map prompt
+            chunk_tokens -= token_manager.count_tokens(chunk_map_reducer.map_overhead_text(user_input))
+          # Splitting encodes the whole input; keep it off the event loop
+          chunks = await asyncio.to_thread(token_manager.split_large_message, user_input, chunk_tokens)
+          # Every chunk fills about a context window, so it gets a request's budget
+          budget.scale(chunked_request_count(len(chunks), args.chunk_mode))
+
+          if args.chunk_mode == "map-reduce":
+            print_status_message(f"Analyzing {len(chunks)} chunks, up to {chunk_map_reducer.max_concurrency} at a time...", "info")
+            content = await chunk_map_reducer.run(chunks, user_input)
+            token_manager.add_to_history(conversation_history, content)
+
+            if token_manager.should_truncate_history(conversation_history):
+              print_status_message("Truncating conversation history to manage context window...", "warning")
+              conversation_history = token_manager.truncate_conversation_history(conversation_history)
+
+            # Combine the partial answers, then keep the exchange in the main session
+            print_status_message("Combining the chunk analyses...", "info")
+            await apply_summary()
+            events_async = chunk_map_reducer.reduce_events(content, run_config)
+            if event_recorder:
+              events_async = event_recorder.record(events_async, user_input)
+            response_time = await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator,
+                                                 tool_tracker=tool_tracker)
+            await chunk_map_reducer.record_exchange(session_service, session, content, root_agent.name)
+            await compact_session()
+            report_budget(budget)
+            print()
+            continue
+
+          for i, chunk in enumerate(chunks):
+            print_status_message(f"Processing chunk {i+1}/{len(chunks)}...", "info")
+            content = types.Content(role='user', parts=[types.Part(text=chunk)])
+            token_manager.add_to_history(conversation_history, content)
+
+            # Check and truncate conversation history if needed
+            if token_manager.should_truncate_history(conversation_history):
+              print_status_message("Truncating conversation history to manage context window...", "warning")
+              conversation_history = token_manager.truncate_conversation_history(conversation_history)
+
+            await apply_summary()
+            events_async = start_run(content)
+
+            # Process response for this chunk with error recovery
+            response_time = await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator,
+                                                 tool_tracker=tool_tracker)
+            await compact_session()
+            print() # Add blank line between chunks
+          report_budget(budget)
+        else:
+          content = types.Content(role='user', parts=[types.Part(text=user_input)])
+          token_manager.add_to_history(conversation_history, content)
+
           # Check and truncate conversation history if needed
           if token_manager.should_truncate_history(conversation_history):
             print_status_message("Truncating conversation history to manage context window...", "warning")
             conversation_history = token_manager.truncate_conversation_history(conversation_history)
-          
-          events_async = runner.run_async(
-              session_id=session.id, user_id=session.user_id, new_message=content
-          )
-          
-          # Process response for this chunk with error recovery
-          response_time = await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator)
-          print() # Add blank line between chunks
-      else:
-        content = types.Content(role='user', parts=[types.Part(text=user_input)])
-        conversation_history.append(content)
-        
-        # Check and truncate conversation history if needed
-        if token_manager.should_truncate_history(conversation_history):
-          print_status_message("Truncating conversation history to manage context window...", "warning")
-          conversation_history = token_manager.truncate_conversation_history(conversation_history)
 
-        events_async = runner.run_async(
-            session_id=session.id, user_id=session.user_id, new_message=content
-        )
-        
-        # Process response with error recovery
-        response_time = await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator)
-        
-        # Show compact stats after each response
-        current_tokens = token_manager.count_tokens(str(conversation_history))
-        print_session_stats(current_tokens, response_time, stats.message_count)
-        print()  # Add blank line before next "You:" prompt
+          await apply_summary()
+          events_async = start_run(content)
+
+          # Process response with error recovery
+          response_time = await process_events(events_async, error_recovery, stats, conversation_logger, loading_indicator,
+                                               tool_tracker=tool_tracker)
+          await compact_session()
+          report_budget(budget)
+
+          # Show compact stats after each response
+          current_tokens = token_manager.history_tokens
+          print_session_stats(current_tokens, response_time, stats.message_count)
+          print()  # Add blank line before next "You:" prompt
 
 
 # Cleanup is handled automatically by exit_stack.aclose()
@@ -0,0 +1,192 @@
+"""
+Compaction of the ADK session that the runner actually sends to the model.
+
+The runner rebuilds every prompt from the events stored in the session
+service, so trimming a local history list does not make requests smaller.
+SessionCompactor works on the stored events instead: between turns it replaces
+bulky function_response payloads that have already been consumed with a short
+preview, and evicts the oldest whole turns once the session exceeds a token
+budget. The most recent turns are never touched.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Set
+
+from google.genai import types
+
+from .token_manager import TokenManager
+
+
+# Marks the event that holds the rolling summary of evicted turns (see HistorySummarizer)
+SUMMARY_METADATA_KEY = 'conversation_summary'
+
+
+def get_stored_session(session_service, session):
+    """Return the session object the service keeps, or None if it is not reachable."""
+    sessions = getattr(session_service, 'sessions', None)
+    if not isinstance(sessions, dict):
+        return None
+    return sessions.get(session.app_name, {}).get(session.user_id, {}).get(session.id)
+
+
+def is_summary_event(event) -> bool:
+    return bool(event.custom_metadata and event.custom_metadata.get(SUMMARY_METADATA_KEY))
+
+
+def find_turn_starts(events) -> List[int]:
+    """Indexes of the events that start a turn (messages typed by the user)."""
+    return [
+        index for index, event in enumerate(events)
+        if event.author == 'user' and not is_summary_event(event)
+        and event.content and any(part.text for part in event.content.parts or [])
+    ]
+
+
+def estimate_event_tokens(token_manager: TokenManager, event) -> int:
+    """Estimate the prompt tokens an event adds when the runner resends it."""
+    tokens = 0
+    if event.content and event.content.parts:
+        for part in event.content.parts:
+            if part.text:
+                tokens += token_manager.estimate_tokens(part.text)
+            elif part.function_call:
+                tokens += token_manager.estimate_tokens(json.dumps(part.function_call.args or {}, default=str))
+            elif part.function_response:
+                tokens += token_manager.estimate_tokens(json.dumps(part.function_response.response or {}, default=str))
+    return tokens
+
+
+@dataclass
+class CompactionResult:
+    """What a single compaction pass changed."""
+    tokens_before: int = 0
+    tokens_after: int = 0
+    evicted_events: int = 0
+    evicted_turns: int = 0
+    stubbed_payloads: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.evicted_events or self.stubbed_payloads)
+
+
+class SessionCompactor:
+    """Keeps the stored events of a session under a prompt token budget."""
+
+    def __init__(self, token_manager: TokenManager, budget_tokens: int, keep_recent_turns: int = 2,
+                 max_payload_chars: int = 2000, preview_chars: int = 300):
+        """
+        Args:
+            token_manager: Used to estimate the tokens of each event
+            budget_tokens: Token budget for the events of a session
+            keep_recent_turns: Most recent turns that are never compacted
+            max_payload_chars: Consumed function responses larger than this are stubbed
+            preview_chars: Characters of a stubbed payload kept as a preview
+        """
+        self.token_manager = token_manager
+        self.budget_tokens = budget_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.max_payload_chars = max_payload_chars
+        self.preview_chars = preview_chars
+        # Estimated tokens per event id, so each event is only measured once
+        self._event_tokens: Dict[str, int] = {}
+        # Events whose payloads have already been checked for stubbing
+        self._checked_events: Set[str] = set()
+
+    def _tokens_of(self, event) -> int:
+        cached = self._event_tokens.get(event.id)
+        if cached is None:
+            cached = self._event_tokens[event.id] = estimate_event_tokens(self.token_manager, event)
+        return cached
+
+    def _stub_payloads(self, event):
+        """Return a copy of event with oversized function responses replaced by a preview, or None."""
+        if not event.content or not event.content.parts:
+            return None
+        new_parts = []
+        stubbed = 0
+        for part in event.content.parts:
+            response = part.function_response
+            if response is not None and not (response.response or {}).get('compacted'):
+                payload = json.dumps(response.response or {}, default=str)
+                if len(payload) > self.max_payload_chars:
+                    part = types.Part(function_response=types.FunctionResponse(
+                        id=response.id,
+                        name=response.name,
+                        response={
+                            'compacted': True,
+                            'original_chars': len(payload),
+                            'preview': payload[:self.preview_chars],
+                        },
+                    ))
+                    stubbed += 1
+            new_parts.append(part)
+        if not stubbed:
+            return None
+        new_content = types.Content(role=event.content.role, parts=new_parts)
+        return event.model_copy(update={'content': new_content}), stubbed
+
+    async def compact(self, session_service, session) -> CompactionResult:
+        """
+        Compact the stored events of a session between turns.
+
+        Sessions of services that do not expose their storage are left alone.
+        """
+        result = CompactionResult()
+        storage = get_stored_session(session_service, session)
+        if storage is None:
+            return result
+
+        events = list(storage.events)
+        result.tokens_before = sum(self._tokens_of(event) for event in events)
+        turn_starts = find_turn_starts(events)
+        # Events from protected_from on belong to the most recent turns
+        if self.keep_recent_turns <= 0:
+            protected_from = len(events)
+        elif len(turn_starts) >= self.keep_recent_turns:
+            protected_from = turn_starts[-self.keep_recent_turns]
+        else:
+            protected_from = 0
+
+        # Tool results older than the protected turns have been read by the model already
+        for index in range(protected_from):
+            event_id = events[index].id
+            if event_id in self._checked_events:
+                continue
+            self._checked_events.add(event_id)
+            stubbed = self._stub_payloads(events[index])
+            if stubbed is not None:
+                self._event_tokens.pop(event_id, None)
+                events[index], count = stubbed
+                result.stubbed_payloads += count
+
+        # Evict whole turns, oldest first, until the events fit the budget
+        total = sum(self._tokens_of(event) for event in events)
+        cut = 0
+        for turn_index, start in enumerate(turn_starts):
+            if total <= self.budget_tokens or start >= protected_from:
+                break
+            next_start = turn_starts[turn_index + 1] if turn_index + 1 < len(turn_starts) else len(events)
+            if next_start > protected_from:
+                break
+            total -= sum(self._tokens_of(event) for event in events[start:next_start])
+            cut = next_start
+            result.evicted_turns += 1
+
+        # Anything before the first turn (e.g. seeded events) goes with the first
+        # evicted turn, except the summary that stands in for earlier turns
+        if cut:
+            kept = [event for event in events[:cut] if is_summary_event(event)]
+            for event in events[:cut]:
+                if not is_summary_event(event):
+                    self._event_tokens.pop(event.id, None)
+                    self._checked_events.discard(event.id)
+            result.evicted_events = cut - len(kept)
+            events = kept + events[cut:]
+            total = sum(self._tokens_of(event) for event in events)
+
+        if result.changed:
+            storage.events = events
+        result.tokens_after = total
+        return result
@@ -0,0 +1,200 @@
+"""
+Startup phase profiler for the Google ADK agent.
+
+Enabled with --profile-startup, it times each startup phase (imports,
+environment loading, token manager, MCP servers, agents, runner, session)
+with a monotonic clock and writes a JSON report plus a short table once the
+agent is ready. With --profile-imports it also records per-module import
+times. This module only uses the standard library so it can be loaded
+before anything heavy is imported.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from importlib.abc import MetaPathFinder
+from typing import Dict, List, Optional
+
+
+class _TimedLoader:
+    """Loader proxy that measures how long a module takes to execute."""
+
+    def __init__(self, loader, fullname: str, profiler: 'StartupProfiler'):
+        self._loader = loader
+        self._fullname = fullname
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.import_times[self._fullname] = time.perf_counter() - start
+            # Put the real loader back so the module looks untouched afterwards
+            if getattr(module, '__loader__', None) is self:
+                module.__loader__ = self._loader
+            if getattr(module, '__spec__', None) is not None and module.__spec__.loader is self:
+                module.__spec__.loader = self._loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer(MetaPathFinder):
+    """Meta path finder that wraps every found loader in a _TimedLoader."""
+
+    def __init__(self, profiler: 'StartupProfiler'):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, fullname, self._profiler)
+        return spec
+
+
+class StartupProfiler:
+    """Collects timings of named startup phases."""
+
+    def __init__(self, capture_imports: bool = False):
+        self.start_time = time.perf_counter()
+        self.started_at = datetime.now()
+        self.phases: List[Dict] = []
+        self.import_times: Dict[str, float] = {}
+        self.budgets: Dict[str, float] = {}
+        self.notes: List[str] = []
+        self.total_time: Optional[float] = None
+        self._import_timer = None
+        if capture_imports:
+            self._import_timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._import_timer)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as a startup phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, start=start)
+
+    def record(self, name: str, duration: float, start: Optional[float] = None):
+        """Record a phase measured elsewhere (e.g. per-server MCP readiness times)."""
+        offset = (start - self.start_time) if start is not None else None
+        self.phases.append({"name": name, "start": offset, "duration": duration})
+
+    def set_budget(self, name: str, seconds: float):
+        """Flag the named phase in the report if it takes longer than seconds."""
+        self.budgets[name] = seconds
+
+    def note(self, message: str):
+        """Attach a free-form observation (e.g. a budget violation) to the report."""
+        self.notes.append(message)
+
+    def over_budget(self) -> List[str]:
+        """Return the names of phases that exceeded their budget."""
+        return [
+            phase["name"] for phase in self.phases
+            if phase["name"] in self.budgets and phase["duration"] > self.budgets[phase["name"]]
+        ]
+
+    def finish(self):
+        """Stop the clock and uninstall the import hook."""
+        if self.total_time is None:
+            self.total_time = time.perf_counter() - self.start_time
+        if self._import_timer is not None and self._import_timer in sys.meta_path:
+            sys.meta_path.remove(self._import_timer)
+
+    def report(self) -> Dict:
+        """Build the JSON-serializable report."""
+        self.finish()
+        slowest_imports = sorted(self.import_times.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "started_at": self.started_at.isoformat(),
+            "python": sys.version.split()[0],
+            "argv": sys.argv[1:],
+            "total_seconds": round(self.total_time, 6),
+            "phases": [
+                {
+                    "name": phase["name"],
+                    "start_seconds": round(phase["start"], 6) if phase["start"] is not None else None,
+                    "duration_seconds": round(phase["duration"], 6),
+                }
+                for phase in self.phases
+            ],
+            "budgets": self.budgets,
+            "over_budget": self.over_budget(),
+            "notes": self.notes,
+            "imports": {name: round(duration, 6) for name, duration in slowest_imports},
+        }
+
+    def write_report(self, filepath: Optional[str] = None) -> str:
+        """Write the JSON report and return its path."""
+        if not filepath:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            profile_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "startup_profiles")
+            os.makedirs(profile_dir, exist_ok=True)
+            filepath = os.path.join(profile_dir, f"startup_{timestamp}.json")
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        return filepath
+
+    def print_table(self, max_imports: int = 10):
+        """Print a short table of phase timings and the slowest imports."""
+        report = self.report()
+        total = report["total_seconds"] or 1e-9
+        print(f"\n{'Startup phase':<36}{'Seconds':>10}{'Share':>8}")
+        print("-" * 54)
+        for phase in report["phases"]:
+            share = phase["duration_seconds"] / total * 100
+            marker = " !" if phase["name"] in report["over_budget"] else ""
+            print(f"{phase['name'][:35]:<36}{phase['duration_seconds']:>10.3f}{share:>7.1f}%{marker}")
+        print("-" * 54)
+        print(f"{'Total until ready':<36}{report['total_seconds']:>10.3f}")
+        for name in report["over_budget"]:
+            print(f"! {name} exceeded its {self.budgets[name]:.3f}s budget")
+        for message in report["notes"]:
+            print(f"! {message}")
+        if report["imports"]:
+            print(f"\n{'Slowest imports (inclusive)':<44}{'Seconds':>10}")
+            print("-" * 54)
+            for name, duration in list(report["imports"].items())[:max_imports]:
+                print(f"{name[:43]:<44}{duration:>10.3f}")
+        print()
+
+
+# Process-wide profiler, only present when --profile-startup is given
+_profiler: Optional[StartupProfiler] = None
+
+
+def start_startup_profiler(capture_imports: bool = False) -> StartupProfiler:
+    """Create the process-wide profiler if it does not exist yet."""
+    global _profiler
+    if _profiler is None:
+        _profiler = StartupProfiler(capture_imports=capture_imports)
+    return _profiler
+
+
+def get_startup_profiler() -> Optional[StartupProfiler]:
+    """Return the active profiler, or None when profiling is disabled."""
+    return _profiler
+
+
+def profile_phase(name: str):
+    """Time a phase if profiling is enabled; a no-op context otherwise."""
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.phase(name)
@@ -0,0 +1,106 @@
+"""
+Token budgets for a single user request.
+
+One request can fan out into many model calls: the root agent calls its
+AgentTool-wrapped sub-agents, which may loop over their own tools. A
+TokenBudget is opened for each request (see TokenManager.request_budget) and
+held in a context variable, so every model call made while handling the
+request, including those of sub-agents, is charged to it. The budget warns
+once past its soft limit and stops further model calls past its hard limit,
+either for the whole request or for a single sub-agent.
+"""
+
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class TokenBudget:
+    """Tokens spent by one request, per agent, against soft and hard limits."""
+
+    def __init__(self, soft_limit: Optional[int] = None, hard_limit: Optional[int] = None,
+                 agent_limit: Optional[int] = None, top_level_agents: Iterable[str] = (),
+                 on_soft_limit: Optional[Callable[['TokenBudget'], None]] = None):
+        """
+        Args:
+            soft_limit: Tokens after which on_soft_limit is called once
+            hard_limit: Tokens after which no further model calls are made
+            agent_limit: Tokens each sub-agent may spend
+            top_level_agents: Agents only bound by hard_limit: those given the
+                user's input itself (the root agent and the chunk analyst)
+            on_soft_limit: Called with the budget the first time soft_limit is passed
+        """
+        self.soft_limit = soft_limit or None
+        self.hard_limit = hard_limit or None
+        self.agent_limit = agent_limit or None
+        self.top_level_agents = frozenset(top_level_agents)
+        self.on_soft_limit = on_soft_limit
+        self.per_agent: Dict[str, Dict[str, int]] = {}
+        self.model_calls = 0
+        self.warned = False
+        # Agents whose model calls were refused, with the reason
+        self.stopped: Dict[str, str] = {}
+        # Prompt estimate of the model call in progress per (invocation id, agent)
+        self.pending_prompt_tokens: Dict[Tuple[str, str], int] = {}
+
+    @property
+    def used(self) -> int:
+        return sum(usage["total"] for usage in self.per_agent.values())
+
+    def used_by(self, agent_name: str) -> int:
+        return self.per_agent.get(agent_name, {}).get("total", 0)
+
+    def check(self, agent_name: str, prompt_tokens: int = 0) -> Optional[str]:
+        """
+        Return why a model call of agent_name with about prompt_tokens must not be made, or None.
+        """
+        if self.hard_limit and self.used + prompt_tokens > self.hard_limit:
+            return f"the request has used {self.used:,} of its {self.hard_limit:,} token budget"
+        if self.agent_limit and agent_name not in self.top_level_agents and self.used_by(agent_name) + prompt_tokens > self.agent_limit:
+            return f"{agent_name} has used {self.used_by(agent_name):,} of its {self.agent_limit:,} token budget"
+        return None
+
+    def scale(self, requests: int):
+        """
+        Give the request the soft and hard limits of `requests` requests.
+
+        Used when an input larger than the context limit is split: every
+        chunk costs about a full context window, so it gets the budget of a
+        request of its own. The sub-agent limit is unchanged.
+        """
+        if self.soft_limit:
+            self.soft_limit *= requests
+        if self.hard_limit:
+            self.hard_limit *= requests
+
+    def refuse(self, agent_name: str, reason: str):
+        self.stopped[agent_name] = reason
+
+    def record(self, agent_name: str, prompt_tokens: int, output_tokens: int, total_tokens: Optional[int] = None):
+        """Charge one model call to agent_name."""
+        usage = self.per_agent.setdefault(agent_name, {"calls": 0, "prompt": 0, "output": 0, "total": 0})
+        usage["calls"] += 1
+        usage["prompt"] += prompt_tokens
+        usage["output"] += output_tokens
+        usage["total"] += total_tokens if total_tokens is not None else prompt_tokens + output_tokens
+        self.model_calls += 1
+        if self.soft_limit and not self.warned and self.used > self.soft_limit:
+            self.warned = True
+            if self.on_soft_limit:
+                self.on_soft_limit(self)
+
+    def breakdown(self) -> Dict:
+        """Return the spending of the request, largest agent first."""
+        agents = sorted(self.per_agent.items(), key=lambda item: item[1]["total"], reverse=True)
+        return {
+            "used": self.used,
+            "soft_limit": self.soft_limit,
+            "hard_limit": self.hard_limit,
+            "agent_limit": self.agent_limit,
+            "model_calls": self.model_calls,
+            "agents": dict(agents),
+            "stopped": dict(self.stopped),
+        }
+
+
+# Budget of the request being handled in the current context
+current_budget: ContextVar[Optional[TokenBudget]] = ContextVar("current_budget", default=None)
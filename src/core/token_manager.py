@@ -1,12 +1,51 @@
 """
 Token counting and context window management for Google ADK agents.
 """
-import tiktoken
-from typing import List, Dict, Any
+import asyncio
+import json
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import partial
+from itertools import accumulate, chain
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+from google.adk.models.llm_response import LlmResponse
 from google.genai import types
+from .token_budget import TokenBudget, current_budget
+from .tokenizers import EstimatorTokenizer, TiktokenTokenizer, Tokenizer
+
+# Texts at least this long are counted in worker threads by count_tokens_async
+ASYNC_COUNT_MIN_CHARS = 64 * 1024
+# Target shard size for batch encoding
+ASYNC_COUNT_SHARD_CHARS = 256 * 1024
+# How far the byte-ratio estimate can undercount: about 2x for code and logs,
+# which have far fewer bytes per token than English prose (cl100k: logs ~1.7x,
+# code ~2x). The fallback split windows are sized for it; near_limit is not,
+# it only escalates within the configured band
+ESTIMATE_MAX_UNDERCOUNT = 2.0
+
+
+def _paragraph_shards(text: str, shard_chars: int) -> Iterator[str]:
+    """Cut text into pieces of about shard_chars, preferring paragraph and line breaks."""
+    start = 0
+    while start < len(text):
+        end = start + shard_chars
+        if end >= len(text):
+            yield text[start:]
+            return
+        for separator in ("\n\n", "\n"):
+            position = text.rfind(separator, start + shard_chars // 2, end)
+            if position != -1:
+                end = position + len(separator)
+                break
+        yield text[start:end]
+        start = end
+
 
 class TokenManager:
-    def __init__(self, model_name: str = "gpt-4", max_context_tokens: int = 120000):
+    def __init__(self, model_name: str = "gpt-4", max_context_tokens: int = 120000,
+                 exact_tokenizer: Optional[Tokenizer] = None, estimator: Optional[Tokenizer] = None,
+                 escalation_band: float = 0.1):
         """
         Initialize token manager.
         
@@ -15,38 +54,251 @@ class TokenManager:
             max_context_tokens: Maximum context window size
                 - Gemini 1.5 and 2.x models: 1,000,000 tokens
                 - Other models: 120,000 tokens
+            exact_tokenizer: Backend for exact counts (defaults to tiktoken; see ProviderTokenizer)
+            estimator: Backend for cheap estimates used by routine budget checks
+            escalation_band: Fraction of a limit within which an estimate is
+                replaced by an exact count before deciding
         """
-        # Use gpt-4 encoding as fallback for Gemini models since tiktoken doesn't support them directly
-        try:
-            self.encoding = tiktoken.encoding_for_model("gpt-4")
-        except:
-            self.encoding = tiktoken.get_encoding("cl100k_base")
+        # Splitting works on tiktoken token ids whichever backend counts; the
+        # encoding itself is only loaded on first use (see preload())
+        self.tiktoken = TiktokenTokenizer()
+        self.exact_tokenizer = exact_tokenizer or self.tiktoken
+        self.estimator = estimator or EstimatorTokenizer()
+        self.escalation_band = escalation_band
         
         self.max_context_tokens = max_context_tokens
         self.safety_margin = 2000  # Reserve tokens for response
+
+        # Ledger of the tracked conversation history: the messages plus prefix
+        # sums of their token counts (_prefix_tokens[i] = tokens of the first i
+        # messages), counted once on append so per-turn checks are O(1).
+        # Counts are estimates until the history gets close to the limit.
+        self._ledger_contents: List[types.Content] = []
+        self._prefix_tokens: List[int] = [0]
+        self._ledger_exact = False
+
+        # Limits of the budget opened for each request (see request_budget)
+        self.budget_limits: Dict[str, Any] = {}
+        self.last_budget: Optional[TokenBudget] = None
         
+    def preload(self):
+        """Load the tiktoken encoding in the background so startup never waits for it."""
+        self.tiktoken.preload()
+
+    @property
+    def encoding(self):
+        """The tiktoken encoding (loaded on access)."""
+        return self.tiktoken.encoding
+
     def count_tokens(self, text: str) -> int:
         """Count tokens in a text string."""
-        if not text:
-            return 0
-        return len(self.encoding.encode(text))
+        return self.exact_tokenizer.count(text)
+
+    def estimate_tokens(self, text: str) -> int:
+        """Estimate tokens in a text string without encoding it."""
+        return self.estimator.count(text)
+
+    def near_limit(self, tokens: int, limit: int) -> bool:
+        """
+        Check whether an estimate is too close to a limit to decide on.
+
+        The band is escalation_band on either side of the limit. Estimates of
+        code or logs can be low by up to ESTIMATE_MAX_UNDERCOUNT, so for such
+        inputs a band of about 0.5 is needed to catch every text over the limit.
+        """
+        return abs(tokens - limit) <= self.escalation_band * limit
+
+    def count_tokens_for_limit(self, text: str, limit: int) -> int:
+        """
+        Count tokens for a comparison against limit.
+
+        Returns the estimate when it is clearly above or below the limit and
+        an exact count when it falls within the escalation band.
+        """
+        estimate = self.estimate_tokens(text)
+        if self.near_limit(estimate, limit):
+            return self.count_tokens(text)
+        return estimate
     
-    def count_content_tokens(self, content: types.Content) -> int:
-        """Count tokens in a Content object."""
+    async def count_tokens_async(self, text: str) -> int:
+        """
+        Count tokens without blocking the event loop.
+
+        Strings shorter than ASYNC_COUNT_MIN_CHARS are counted inline. Larger
+        ones are counted in a worker thread; with tiktoken the text is cut into
+        paragraph shards encoded by encode_ordinary_batch, which releases the
+        GIL and spreads the work over several cores. Shard edges fall on
+        paragraph or line breaks, so the total matches a single encode except
+        for the rare hard cut inside a very long line.
+        """
+        if len(text) < ASYNC_COUNT_MIN_CHARS:
+            return self.count_tokens(text)
+        loop = asyncio.get_running_loop()
+        if self.exact_tokenizer is not self.tiktoken:
+            return await loop.run_in_executor(None, self.exact_tokenizer.count, text)
+        encoding = self.tiktoken.get_encoding()
+        if encoding is None:
+            # Not loaded yet: the estimate is cheap enough to compute inline
+            return self.count_tokens(text)
+        shards = list(_paragraph_shards(text, ASYNC_COUNT_SHARD_CHARS))
+        token_lists = await loop.run_in_executor(
+            None, partial(encoding.encode_ordinary_batch, shards, num_threads=os.cpu_count() or 4)
+        )
+        return sum(map(len, token_lists))
+
+    async def count_tokens_for_limit_async(self, text: str, limit: int) -> int:
+        """Like count_tokens_for_limit, with the exact count off the event loop."""
+        estimate = self.estimate_tokens(text)
+        if self.near_limit(estimate, limit):
+            return await self.count_tokens_async(text)
+        return estimate
+
+    def count_content_tokens(self, content: types.Content, exact: bool = True) -> int:
+        """Count (or with exact=False, estimate) tokens in a Content object."""
+        count_text = self.count_tokens if exact else self.estimate_tokens
         total_tokens = 0
         if content.parts:
             for part in content.parts:
                 if part.text:
-                    total_tokens += self.count_tokens(part.text)
+                    total_tokens += count_text(part.text)
                 # Add small overhead for function calls/responses
                 elif part.function_call or part.function_response:
                     total_tokens += 100
         return total_tokens
     
+    def add_to_history(self, conversation_history: List[types.Content], content: types.Content) -> int:
+        """
+        Append content to the conversation history and record its token count.
+
+        Returns the token count of the new content.
+        """
+        if not self._is_tracked(conversation_history):
+            self._track(conversation_history)
+        content_tokens = self.count_content_tokens(content, exact=self._ledger_exact)
+        conversation_history.append(content)
+        self._ledger_contents.append(content)
+        self._prefix_tokens.append(self._prefix_tokens[-1] + content_tokens)
+        return content_tokens
+
+    @property
+    def history_tokens(self) -> int:
+        """Total tokens of the tracked conversation history."""
+        return self._prefix_tokens[-1]
+
+    def reset_history(self):
+        """Forget the tracked conversation history."""
+        self._ledger_contents = []
+        self._prefix_tokens = [0]
+        self._ledger_exact = False
+
+    def set_request_budget(self, soft_limit: Optional[int] = None, hard_limit: Optional[int] = None,
+                           agent_limit: Optional[int] = None, top_level_agents: Iterable[str] = ()):
+        """Set the limits of the budget opened for each request; None or 0 means unlimited."""
+        self.budget_limits = {
+            "soft_limit": soft_limit,
+            "hard_limit": hard_limit,
+            "agent_limit": agent_limit,
+            "top_level_agents": tuple(top_level_agents),
+        }
+
+    def begin_request(self, on_soft_limit=None) -> TokenBudget:
+        """
+        Open a new TokenBudget and charge every model call made in the current context to it.
+
+        Sub-agents run by AgentTool inherit the context, so their calls count
+        towards the same request. The budget stays available as last_budget.
+        """
+        budget = TokenBudget(**self.budget_limits, on_soft_limit=on_soft_limit)
+        self.last_budget = budget
+        current_budget.set(budget)
+        return budget
+
+    @contextmanager
+    def request_budget(self, on_soft_limit=None) -> Iterator[TokenBudget]:
+        """Like begin_request, closing the budget when the block exits."""
+        reset_token = current_budget.set(None)
+        try:
+            yield self.begin_request(on_soft_limit)
+        finally:
+            current_budget.reset(reset_token)
+
+    def _estimate_request_tokens(self, contents: List[types.Content], exact: bool = False) -> int:
+        count_text = self.count_tokens if exact else self.estimate_tokens
+        tokens = 0
+        for content in contents:
+            for part in content.parts or []:
+                if part.text:
+                    tokens += count_text(part.text)
+                elif part.function_call:
+                    tokens += count_text(json.dumps(part.function_call.args or {}, default=str))
+                elif part.function_response:
+                    tokens += count_text(json.dumps(part.function_response.response or {}, default=str))
+        return tokens
+
+    def before_model_callback(self, callback_context, llm_request) -> Optional[LlmResponse]:
+        """ADK before_model_callback: refuse model calls that would exceed the request budget."""
+        budget = current_budget.get()
+        if budget is None:
+            return None
+        agent_name = callback_context.agent_name
+        prompt_tokens = self._estimate_request_tokens(llm_request.contents)
+        reason = budget.check(agent_name, prompt_tokens)
+        if reason is not None:
+            # Estimates of prose run high; refuse only on an exact count
+            prompt_tokens = self._estimate_request_tokens(llm_request.contents, exact=True)
+            reason = budget.check(agent_name, prompt_tokens)
+        if reason is None:
+            # Used by after_model_callback if the model reports no usage
+            budget.pending_prompt_tokens[(callback_context.invocation_id, agent_name)] = prompt_tokens
+            return None
+        budget.refuse(agent_name, reason)
+        return LlmResponse(
+            content=types.Content(role='model', parts=[types.Part(text=f"Stopped before calling the model: {reason}.")]),
+            custom_metadata={"token_budget_stop": True},
+        )
+
+    def after_model_callback(self, callback_context, llm_response) -> None:
+        """ADK after_model_callback: charge the tokens of a model call to the request budget."""
+        budget = current_budget.get()
+        if budget is None or llm_response.partial:
+            return None
+        if llm_response.custom_metadata and llm_response.custom_metadata.get("token_budget_stop"):
+            return None
+        agent_name = callback_context.agent_name
+        estimated_prompt = budget.pending_prompt_tokens.pop((callback_context.invocation_id, agent_name), 0)
+        usage = llm_response.usage_metadata
+        if usage is not None and usage.prompt_token_count is not None:
+            output_tokens = (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0)
+            budget.record(agent_name, usage.prompt_token_count, output_tokens, usage.total_token_count)
+        else:
+            output_tokens = self._estimate_request_tokens([llm_response.content] if llm_response.content else [])
+            budget.record(agent_name, estimated_prompt, output_tokens)
+        return None
+
+    def _is_tracked(self, conversation_history: List[types.Content]) -> bool:
+        """Check (in O(1)) whether the ledger describes this history list."""
+        if len(self._ledger_contents) != len(conversation_history):
+            return False
+        return not conversation_history or self._ledger_contents[-1] is conversation_history[-1]
+
+    def _track(self, conversation_history: List[types.Content]):
+        """Rebuild the ledger for a history that was changed outside add_to_history."""
+        self._ledger_contents = list(conversation_history)
+        self._prefix_tokens = [0]
+        self._prefix_tokens.extend(accumulate(
+            self.count_content_tokens(content, exact=self._ledger_exact) for content in conversation_history
+        ))
+
     def should_truncate_history(self, conversation_history: List[types.Content]) -> bool:
         """Check if conversation history exceeds safe token limit."""
-        total_tokens = sum(self.count_content_tokens(content) for content in conversation_history)
-        return total_tokens > (self.max_context_tokens - self.safety_margin)
+        if not self._is_tracked(conversation_history):
+            self._track(conversation_history)
+        limit = self.max_context_tokens - self.safety_margin
+        if not self._ledger_exact and self.near_limit(self.history_tokens, limit):
+            # Close to the limit: recount exactly and keep counting exactly
+            self._ledger_exact = True
+            self._track(conversation_history)
+        return self.history_tokens > limit
     
     def truncate_conversation_history(self, conversation_history: List[types.Content]) -> List[types.Content]:
         """
@@ -59,22 +311,96 @@ class TokenManager:
         if not self.should_truncate_history(conversation_history):
             return conversation_history
         
-        # Always keep the first message (usually system prompt)
-        truncated = [conversation_history[0]] if conversation_history else []
-        remaining_tokens = self.max_context_tokens - self.safety_margin
-        remaining_tokens -= self.count_content_tokens(conversation_history[0])
+        prefix = self._prefix_tokens
+        first_tokens = prefix[1]
+        budget = self.max_context_tokens - self.safety_margin - first_tokens
         
-        # Add messages from the end, working backwards
-        for content in reversed(conversation_history[1:]):
-            content_tokens = self.count_content_tokens(content)
-            if content_tokens <= remaining_tokens:
-                truncated.insert(1, content)  # Insert after system prompt
-                remaining_tokens -= content_tokens
-            else:
-                break
-                
+        # Always keep the first message (usually system prompt) plus the longest
+        # run of recent messages that fits: the smallest cut with
+        # prefix[-1] - prefix[cut] <= budget, found by binary search
+        cut = bisect_left(prefix, prefix[-1] - budget, 1, len(prefix) - 1)
+        truncated = [conversation_history[0]] + conversation_history[cut:]
+
+        # The truncated list becomes the tracked history
+        self._ledger_contents = list(truncated)
+        self._prefix_tokens = [0, first_tokens] + [tokens - prefix[cut] + first_tokens for tokens in prefix[cut + 1:]]
         return truncated
-    
+
+    # Preferred places to cut a large message, best first
+    SPLIT_SEPARATORS = (b"\n\n", b". ", b"\n", b" ")
+
+    def iter_message_chunks(self, text: str, max_chunk_tokens: int = None) -> Iterator[str]:
+        """
+        Yield chunks of at most max_chunk_tokens tokens from a large text.
+
+        The text is encoded once, in paragraph shards spread over all cores
+        by encode_ordinary_batch, and cut on token boundaries. While tiktoken
+        is not loaded it is cut on byte windows sized for the most tokens per
+        byte the estimate allows (see ESTIMATE_MAX_UNDERCOUNT). Within the second
+        half of each window the cut prefers a paragraph break, then a sentence
+        end, a line break or a space, so chunks rarely split words. Every byte
+        is looked at a bounded number of times, which keeps splitting linear in
+        the size of the text.
+        """
+        if max_chunk_tokens is None:
+            max_chunk_tokens = self.max_context_tokens - self.safety_margin
+        if not text:
+            return
+
+        encoding = self.tiktoken.get_encoding()
+        if encoding is None:
+            # tiktoken is still loading or unavailable: cut on conservative byte windows
+            data = text.encode("utf-8", errors="surrogatepass")
+            bytes_per_token = getattr(self.estimator, 'bytes_per_token', 4.0) / ESTIMATE_MAX_UNDERCOUNT
+            window = max(1, int(max_chunk_tokens * bytes_per_token))
+            if len(data) <= window:
+                yield text
+                return
+            # Every byte is its own unit
+            offsets = range(len(data) + 1)
+        else:
+            # Shards end on paragraph or line breaks, so their tokens line up with the text's bytes
+            shards = list(_paragraph_shards(text, ASYNC_COUNT_SHARD_CHARS))
+            if len(shards) > 1:
+                token_lists = encoding.encode_ordinary_batch(shards, num_threads=os.cpu_count() or 4)
+                tokens = list(chain.from_iterable(token_lists))
+            else:
+                tokens = encoding.encode_ordinary(text)
+            window = max_chunk_tokens
+            if len(tokens) <= window:
+                yield text
+                return
+            try:
+                data = text.encode("utf-8")
+            except UnicodeEncodeError:
+                # Lone surrogates are replaced by the encoder; use its bytes instead
+                data = b"".join(encoding.decode_tokens_bytes(tokens))
+            # offsets[i] is the byte where token i starts; the last entry is the end of the text
+            token_lengths = {token: len(encoding.decode_single_token_bytes(token)) for token in set(tokens)}
+            offsets = [0]
+            offsets.extend(accumulate(map(token_lengths.__getitem__, tokens)))
+        unit_count = len(offsets) - 1
+
+        start = 0
+        while start < unit_count:
+            end = min(start + window, unit_count)
+            if end < unit_count:
+                window_start = offsets[start + window // 2]
+                for separator in self.SPLIT_SEPARATORS:
+                    position = data.rfind(separator, window_start, offsets[end])
+                    if position != -1:
+                        # First unit that starts at or after the separator
+                        end = max(bisect_left(offsets, position + len(separator), start + 1, end), start + 1)
+                        break
+                else:
+                    # Hard cut: do not split a multi-byte character between chunks
+                    while end > start + 1 and 0x80 <= data[offsets[end]] < 0xC0:
+                        end -= 1
+            chunk = data[offsets[start]:offsets[end]].decode("utf-8", errors="replace").strip()
+            if chunk:
+                yield chunk
+            start = end
+
     def split_large_message(self, text: str, max_chunk_tokens: int = None) -> List[str]:
         """
         Split a large text message into smaller chunks.
@@ -83,53 +409,4 @@ class TokenManager:
             text: Text to split
             max_chunk_tokens: Maximum tokens per chunk (defaults to safe limit)
         """
-        if max_chunk_tokens is None:
-            max_chunk_tokens = self.max_context_tokens - self.safety_margin
-            
-        if self.count_tokens(text) <= max_chunk_tokens:
-            return [text]
-        
-        # Split by sentences/paragraphs first, then by words if needed
-        chunks = []
-        current_chunk = ""
-        
-        # Try splitting by double newlines (paragraphs)
-        paragraphs = text.split('\n\n')
-        
-        for paragraph in paragraphs:
-            paragraph_tokens = self.count_tokens(paragraph)
-            current_tokens = self.count_tokens(current_chunk)
-            
-            if current_tokens + paragraph_tokens <= max_chunk_tokens:
-                current_chunk += ("\n\n" + paragraph) if current_chunk else paragraph
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                    current_chunk = ""
-                
-                # If single paragraph is too large, split by sentences
-                if paragraph_tokens > max_chunk_tokens:
-                    sentences = paragraph.split('. ')
-                    for sentence in sentences:
-                        sentence = sentence.strip()
-                        if not sentence:
-                            continue
-                        if not sentence.endswith('.'):
-                            sentence += '.'
-                            
-                        sentence_tokens = self.count_tokens(sentence)
-                        current_tokens = self.count_tokens(current_chunk)
-                        
-                        if current_tokens + sentence_tokens <= max_chunk_tokens:
-                            current_chunk += (" " + sentence) if current_chunk else sentence
-                        else:
-                            if current_chunk:
-                                chunks.append(current_chunk)
-                            current_chunk = sentence
-                else:
-                    current_chunk = paragraph
-        
-        if current_chunk:
-            chunks.append(current_chunk)
-            
-        return chunks
\ No newline at end of file
+        return list(self.iter_message_chunks(text, max_chunk_tokens))
@@ -0,0 +1,224 @@
+"""
+Tokenizer backends used by TokenManager.
+
+Three tiers are available:
+- EstimatorTokenizer: a byte-ratio estimate, cheap enough for every budget check
+- TiktokenTokenizer: exact BPE counts with tiktoken (cl100k_base / gpt-4)
+- ProviderTokenizer: counts from the model provider itself, e.g. Gemini's
+  count_tokens endpoint; any callable taking text and returning a count works,
+  which keeps it easy to stub
+"""
+
+import hashlib
+import importlib.util
+import math
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from typing import Callable, List, Optional
+
+# Pre-seeded location of tiktoken's BPE files, used unless TIKTOKEN_CACHE_DIR is set
+DEFAULT_TIKTOKEN_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "tiktoken_cache"
+)
+
+# tiktoken caches a BPE file under the SHA-1 of its download URL
+CL100K_BPE_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+CL100K_CACHE_KEY = hashlib.sha1(CL100K_BPE_URL.encode()).hexdigest()
+
+
+def _bundled_bpe_dirs() -> List[str]:
+    """Directories of installed packages that ship tiktoken BPE files (litellm bundles cl100k)."""
+    dirs = []
+    try:
+        spec = importlib.util.find_spec("litellm")
+    except (ImportError, ValueError):
+        spec = None
+    # find_spec on a top-level package locates it without importing it
+    for location in (spec.submodule_search_locations or []) if spec else []:
+        dirs.append(os.path.join(location, "litellm_core_utils", "tokenizers"))
+    return dirs
+
+
+@contextmanager
+def _tiktoken_cache_dir(cache_dir: str):
+    """Point tiktoken at cache_dir while loading, restoring the environment afterwards."""
+    previous = os.environ.get("TIKTOKEN_CACHE_DIR")
+    os.environ["TIKTOKEN_CACHE_DIR"] = cache_dir
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("TIKTOKEN_CACHE_DIR", None)
+        else:
+            os.environ["TIKTOKEN_CACHE_DIR"] = previous
+
+
+class Tokenizer(ABC):
+    """Interface shared by all tokenizer backends."""
+
+    name = "tokenizer"
+    # Whether counts are exact rather than estimated
+    exact = True
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Return the number of tokens in text."""
+
+
+class EstimatorTokenizer(Tokenizer):
+    """Estimates tokens from the UTF-8 length of the text without encoding it."""
+
+    name = "estimate"
+    exact = False
+
+    def __init__(self, bytes_per_token: float = 4.0):
+        """
+        Args:
+            bytes_per_token: Average UTF-8 bytes per token (about 4 for English prose)
+        """
+        self.bytes_per_token = bytes_per_token
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return math.ceil(len(text.encode("utf-8", errors="surrogatepass")) / self.bytes_per_token)
+
+
+class TiktokenTokenizer(Tokenizer):
+    """
+    Exact counts with a tiktoken encoding, loaded lazily.
+
+    Nothing is imported or parsed until the first count (or preload()). The
+    BPE file is read from TIKTOKEN_CACHE_DIR when it is set; otherwise from
+    data/tiktoken_cache/ (seeded with python -m src.core.tokenizers) or the
+    copy bundled with litellm, so exact counts work offline. Only a missing
+    file is downloaded, into data/tiktoken_cache/. While a background preload
+    is still running, or if the encoding cannot be loaded at all (see
+    load_error), counts fall back to the estimator.
+    """
+
+    name = "tiktoken"
+
+    def __init__(self, model_name: str = "gpt-4", cache_dir: Optional[str] = None):
+        self.model_name = model_name
+        self.cache_dir = cache_dir or DEFAULT_TIKTOKEN_CACHE_DIR
+        self.load_error: Optional[Exception] = None
+        self._encoding = None
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._preload_thread: Optional[threading.Thread] = None
+        self._fallback = EstimatorTokenizer()
+
+    def bpe_cache_dir(self) -> Optional[str]:
+        """
+        Return the directory tiktoken should load from, or None to leave TIKTOKEN_CACHE_DIR alone.
+
+        The first of cache_dir and the bundled copies that holds the cl100k
+        file wins; without any, cache_dir receives the download.
+        """
+        if "TIKTOKEN_CACHE_DIR" in os.environ:
+            return None
+        for directory in [self.cache_dir] + _bundled_bpe_dirs():
+            if os.path.isfile(os.path.join(directory, CL100K_CACHE_KEY)):
+                return directory
+        return self.cache_dir
+
+    def _load(self):
+        with self._load_lock:
+            if self._loaded:
+                return
+            cache_dir = self.bpe_cache_dir()
+            try:
+                import tiktoken
+                # tiktoken reads the cache location from the environment; only
+                # override it for this load instead of for the whole process
+                with _tiktoken_cache_dir(cache_dir) if cache_dir else nullcontext():
+                    # Use gpt-4 encoding as fallback for Gemini models since tiktoken doesn't support them directly
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(self.model_name)
+                    except KeyError:
+                        self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                self.load_error = e
+            self._loaded = True
+
+    def preload(self):
+        """Load the encoding in a background thread."""
+        if self._preload_thread is None and not self._loaded:
+            self._preload_thread = threading.Thread(target=self._load, name="tiktoken-preload", daemon=True)
+            self._preload_thread.start()
+
+    def get_encoding(self, wait: bool = False):
+        """
+        Return the tiktoken encoding, or None if it is not available.
+
+        The first call loads the encoding unless a background preload is
+        already doing so; then it returns None right away unless wait is set.
+        """
+        if not self._loaded:
+            preloading = self._preload_thread is not None and self._preload_thread.is_alive()
+            if preloading and not wait:
+                return None
+            self._load()
+        return self._encoding
+
+    @property
+    def encoding(self):
+        return self.get_encoding(wait=True)
+
+    @property
+    def ready(self) -> bool:
+        """Whether counts are currently exact."""
+        return self._loaded and self._encoding is not None
+
+    @property
+    def failed(self) -> bool:
+        """Whether loading failed, so counts stay estimates for the rest of the process."""
+        return self._loaded and self._encoding is None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        encoding = self.get_encoding()
+        if encoding is None:
+            return self._fallback.count(text)
+        return len(encoding.encode(text))
+
+
+class ProviderTokenizer(Tokenizer):
+    """Exact counts from the model provider, through any text -> count callable."""
+
+    name = "provider"
+
+    def __init__(self, count_fn: Callable[[str], int], name: str = "provider"):
+        self._count_fn = count_fn
+        self.name = name
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return self._count_fn(text)
+
+
+def gemini_token_counter(model_name: str) -> ProviderTokenizer:
+    """Create a ProviderTokenizer that asks the Gemini API for exact token counts."""
+    from google import genai
+
+    client = genai.Client()
+
+    def count(text: str) -> int:
+        return client.models.count_tokens(model=model_name, contents=text).total_tokens
+
+    return ProviderTokenizer(count, name="gemini")
+
+
+if __name__ == "__main__":
+    # Seed the tiktoken cache so later starts never need the network
+    tokenizer = TiktokenTokenizer()
+    if tokenizer.get_encoding(wait=True) is None:
+        print(f"Could not load the tiktoken encoding: {tokenizer.load_error}", file=sys.stderr)
+        sys.exit(1)
+    print(f"tiktoken cache ready in {tokenizer.bpe_cache_dir() or os.environ['TIKTOKEN_CACHE_DIR']}")
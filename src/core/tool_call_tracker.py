@@ -0,0 +1,191 @@
+"""
+Tracking of tool calls by function-call id.
+
+A model can emit several function_calls in one event and ADK runs them in
+parallel, so calls and responses have to be matched by their id rather than
+by order. ToolCallTracker keeps a table per invocation, keyed by call id,
+with start/end times, argument and result sizes and the status of every
+call. Timings come from ADK tool callbacks when they are installed (see
+create_all_agents) and from event timestamps otherwise; sizes come from the
+events seen by process_events.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..utils.mcp_agent_utils import payload_size
+
+# Invocations whose call tables are kept for lookups
+MAX_TRACKED_INVOCATIONS = 64
+# Values walked when sizing arguments or a result; larger payloads are counted up to here
+MAX_SIZED_VALUES = 100_000
+
+
+def _response_error(response: Any) -> Optional[str]:
+    """Return the error a tool response reports, if any (ADK 'error' key or MCP isError)."""
+    if not isinstance(response, dict):
+        return None
+    if response.get("error"):
+        return str(response["error"])
+    if response.get("isError"):
+        return "the tool reported an error"
+    return None
+
+
+def _payload_chars(value: Any) -> int:
+    """Characters of text in a payload, without serializing it (a lower bound past MAX_SIZED_VALUES)."""
+    return payload_size(value, max_values=MAX_SIZED_VALUES)[0]
+
+
+@dataclass
+class ToolCallRecord:
+    """One tool call and what is known about its outcome."""
+    call_id: str
+    name: str
+    invocation_id: Optional[str] = None
+    agent: Optional[str] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+    arg_chars: int = 0
+    # Wall-clock times in seconds since the epoch
+    started_at: Optional[float] = None
+    ended_at: Optional[float] = None
+    result_chars: Optional[int] = None
+    status: str = "running"
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.ended_at is None:
+            return None
+        return max(0.0, self.ended_at - self.started_at)
+
+
+class ToolCallTracker:
+    """Correlates tool calls with their responses and aggregates per-tool latency."""
+
+    def __init__(self):
+        self._invocations: 'OrderedDict[str, Dict[str, ToolCallRecord]]' = OrderedDict()
+        # Per tool: calls, errors, timed calls, total and max seconds of the finished calls
+        self._tool_stats: Dict[str, Dict[str, float]] = {}
+
+    def _calls_of(self, invocation_id: Optional[str]) -> Dict[str, ToolCallRecord]:
+        key = invocation_id or ""
+        calls = self._invocations.get(key)
+        if calls is None:
+            calls = self._invocations[key] = {}
+            if len(self._invocations) > MAX_TRACKED_INVOCATIONS:
+                self._invocations.popitem(last=False)
+        return calls
+
+    def _find(self, call_id: Optional[str], invocation_id: Optional[str], name: Optional[str]) -> Optional[ToolCallRecord]:
+        calls = self._calls_of(invocation_id)
+        if call_id and call_id in calls:
+            return calls[call_id]
+        if call_id:
+            # Sub-agent calls are recorded under the sub-agent's own invocation
+            for other in self._invocations.values():
+                if call_id in other:
+                    return other[call_id]
+            return None
+        # Without an id, fall back to the oldest open call of the same tool
+        for record in calls.values():
+            if record.name == name and record.status == "running":
+                return record
+        return None
+
+    def start(self, call_id: Optional[str], name: str, args: Optional[Dict[str, Any]] = None,
+              invocation_id: Optional[str] = None, agent: Optional[str] = None,
+              started_at: Optional[float] = None, exact: bool = False) -> ToolCallRecord:
+        """
+        Record the start of a call; calling it again for the same id only fills in missing fields.
+
+        An exact start time (measured when the tool actually starts) replaces
+        one estimated from the function_call event.
+        """
+        record = self._find(call_id, invocation_id, None) if call_id else None
+        if record is None:
+            record = ToolCallRecord(call_id=call_id or f"{name}-{time.time_ns()}", name=name,
+                                    invocation_id=invocation_id, agent=agent)
+            self._calls_of(invocation_id)[record.call_id] = record
+        if args is not None and not record.args:
+            record.args = args
+            record.arg_chars = _payload_chars(args)
+        if record.agent is None:
+            record.agent = agent
+        if record.started_at is None or exact:
+            record.started_at = started_at if started_at is not None else time.time()
+        return record
+
+    def finish(self, call_id: Optional[str], name: Optional[str] = None, response: Any = None,
+               invocation_id: Optional[str] = None, error: Optional[str] = None,
+               ended_at: Optional[float] = None) -> Optional[ToolCallRecord]:
+        """Record the end of a call; the first end time and status reported win."""
+        record = self._find(call_id, invocation_id, name)
+        if record is None:
+            if name is None:
+                return None
+            record = ToolCallRecord(call_id=call_id or f"{name}-{time.time_ns()}", name=name,
+                                    invocation_id=invocation_id)
+            self._calls_of(invocation_id)[record.call_id] = record
+        if response is not None and record.result_chars is None:
+            record.result_chars = _payload_chars(response)
+        if record.status == "running":
+            record.ended_at = ended_at if ended_at is not None else time.time()
+            record.error = error or _response_error(response)
+            record.status = "error" if record.error else "ok"
+            self._add_stats(record)
+        return record
+
+    def _add_stats(self, record: ToolCallRecord):
+        stats = self._tool_stats.setdefault(
+            record.name, {"calls": 0, "errors": 0, "timed": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+        stats["calls"] += 1
+        if record.status == "error":
+            stats["errors"] += 1
+        # Calls first seen by their response have no start time
+        if record.duration is not None:
+            stats["timed"] += 1
+            stats["total_seconds"] += record.duration
+            stats["max_seconds"] = max(stats["max_seconds"], record.duration)
+
+    def calls(self, invocation_id: Optional[str] = None) -> List[ToolCallRecord]:
+        """Return the calls of one invocation, or of every tracked invocation."""
+        if invocation_id is not None:
+            return list(self._invocations.get(invocation_id, {}).values())
+        return [record for calls in self._invocations.values() for record in calls.values()]
+
+    def pending(self, invocation_id: Optional[str] = None) -> List[ToolCallRecord]:
+        return [record for record in self.calls(invocation_id) if record.status == "running"]
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return calls, errors, mean and max seconds per tool, slowest first."""
+        stats = {
+            name: {
+                "calls": int(values["calls"]),
+                "errors": int(values["errors"]),
+                "mean_seconds": values["total_seconds"] / values["timed"] if values["timed"] else 0.0,
+                "max_seconds": values["max_seconds"],
+            }
+            for name, values in self._tool_stats.items()
+        }
+        return dict(sorted(stats.items(), key=lambda item: item[1]["mean_seconds"], reverse=True))
+
+    # ADK agent callbacks (before_tool_callback / after_tool_callback / on_tool_error_callback)
+
+    def before_tool_callback(self, tool, args, tool_context) -> None:
+        self.start(tool_context.function_call_id, tool.name, args,
+                   invocation_id=tool_context.invocation_id, agent=tool_context.agent_name, exact=True)
+        return None
+
+    def after_tool_callback(self, tool, args, tool_context, tool_response) -> None:
+        self.finish(tool_context.function_call_id, tool.name, invocation_id=tool_context.invocation_id,
+                    error=_response_error(tool_response))
+        return None
+
+    def on_tool_error_callback(self, tool, args, tool_context, error) -> None:
+        self.finish(tool_context.function_call_id, tool.name, invocation_id=tool_context.invocation_id,
+                    error=str(error) or type(error).__name__)
+        return None
@@ -0,0 +1,161 @@
+"""
+Pool of MCP server subprocesses shared across sessions.
+
+A single stdio connection serializes the calls made on it, so parallel tool
+calls from different conversations queue behind one subprocess. The pool
+keeps several LazyMCPToolset replicas of the same server, sends each call to
+the least busy replica and bounds how many calls run on a replica at once.
+Extra replicas are only spawned when the warm ones are busy.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+
+
+class PooledMCPTool(BaseTool):
+    """
+    Tool handed to agents by an MCPConnectionPool.
+
+    The declaration comes from the tool of the primary replica; every call is
+    executed by the same-named tool of the replica the pool selects.
+    """
+
+    def __init__(self, pool: 'MCPConnectionPool', primary_tool: BaseTool):
+        super().__init__(name=primary_tool.name, description=primary_tool.description)
+        self._pool = pool
+        self._primary_tool = primary_tool
+
+    def _get_declaration(self):
+        return self._primary_tool._get_declaration()
+
+    async def process_llm_request(self, *, tool_context, llm_request) -> None:
+        await self._primary_tool.process_llm_request(tool_context=tool_context, llm_request=llm_request)
+        # Calls for this name must come back through the pool, not the primary tool
+        llm_request.tools_dict[self.name] = self
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context) -> Any:
+        return await self._pool.call_tool(self.name, args, tool_context)
+
+    def __getattr__(self, name):
+        # Expose the remaining McpTool attributes (raw_mcp_tool, visibility, ...).
+        # copy.copy (e.g. BaseToolset.get_tools_with_prefix) looks up dunders on a
+        # fresh instance before _primary_tool is set; don't recurse into it.
+        if name == '_primary_tool' or (name.startswith('__') and name.endswith('__')):
+            raise AttributeError(name)
+        return getattr(self._primary_tool, name)
+
+
+class MCPConnectionPool(BaseToolset):
+    """
+    Toolset that spreads the tool calls for one MCP server over several replicas.
+
+    Each call goes to the started replica with the fewest calls in flight, so
+    parallel calls of one request and calls of concurrent sessions (daemon
+    queries) spread over the replicas. An unstarted replica is only spawned
+    when every started one is at its concurrency limit.
+    """
+
+    def __init__(self, server_name: str, replicas: List, max_concurrency: int = 1):
+        """
+        Args:
+            server_name: Display name of the pooled server
+            replicas: LazyMCPToolset proxies for the same server; the first one is the primary
+            max_concurrency: Calls that may run on a single replica at the same time
+        """
+        super().__init__()
+        self.server_name = server_name
+        self.replicas = replicas
+        self.max_concurrency = max_concurrency
+        self._semaphores = [asyncio.Semaphore(max_concurrency) for _ in replicas]
+        self._in_flight = [0] * len(replicas)
+        self._replica_tools: List[Optional[Dict[str, BaseTool]]] = [None] * len(replicas)
+
+    @property
+    def is_started(self) -> bool:
+        return self.replicas[0].is_started
+
+    @property
+    def size(self) -> int:
+        return len(self.replicas)
+
+    async def get_tools(self, readonly_context=None):
+        """Return pooled wrappers around the primary replica's tools."""
+        tools = await self.replicas[0].get_tools(readonly_context)
+        return [PooledMCPTool(self, tool) for tool in tools]
+
+    def _select_replica(self) -> int:
+        started = [i for i, replica in enumerate(self.replicas) if replica.is_started]
+        idle = [i for i in started if self._in_flight[i] < self.max_concurrency]
+        # A replica that is still spawning already has a call assigned to it
+        unstarted = [
+            i for i, replica in enumerate(self.replicas)
+            if not replica.is_started and self._in_flight[i] == 0
+        ]
+        if idle:
+            index = min(idle, key=lambda i: self._in_flight[i])
+        elif unstarted:
+            index = unstarted[0]
+        else:
+            # Every replica is busy: queue on the semaphore of the least busy one
+            index = min(range(len(self.replicas)), key=lambda i: self._in_flight[i])
+        return index
+
+    async def _tools_of(self, index: int) -> Dict[str, BaseTool]:
+        if self._replica_tools[index] is None:
+            tools = await self.replicas[index].get_tools()
+            self._replica_tools[index] = {tool.name: tool for tool in tools}
+        return self._replica_tools[index]
+
+    async def call_tool(self, tool_name: str, args: Dict[str, Any], tool_context) -> Any:
+        """Run a tool call on the least busy replica."""
+        index = self._select_replica()
+        self._in_flight[index] += 1
+        try:
+            async with self._semaphores[index]:
+                tools = await self._tools_of(index)
+                if tool_name not in tools:
+                    raise ValueError(f"{self.server_name} replica {index} has no tool named {tool_name}")
+                try:
+                    return await tools[tool_name].run_async(args=args, tool_context=tool_context)
+                except Exception:
+                    # The replica may have been restarted; list its tools again next time
+                    self._replica_tools[index] = None
+                    raise
+        finally:
+            self._in_flight[index] -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return how many replicas are started and how many calls each is running."""
+        return {
+            "replicas": self.size,
+            "started": sum(1 for replica in self.replicas if replica.is_started),
+            "in_flight": list(self._in_flight),
+        }
+
+    async def start(self, timeout: Optional[float] = None) -> bool:
+        """Start the primary replica; the others spawn on demand."""
+        return await self.replicas[0].start(timeout=timeout)
+
+    async def probe(self, timeout: float):
+        """Probe every started replica, raising on the first failure."""
+        await asyncio.gather(*(
+            replica.probe(timeout=timeout) for replica in self.replicas if replica.is_started
+        ))
+
+    async def restart(self, timeout: float, quiet: Optional[bool] = None) -> bool:
+        """Restart the primary replica and shut down the others until they are needed again."""
+        self._replica_tools = [None] * len(self.replicas)
+        for replica in self.replicas[1:]:
+            try:
+                await replica.close()
+            except Exception:
+                replica._toolset = None
+        return await self.replicas[0].restart(timeout=timeout, quiet=quiet)
+
+    async def close(self):
+        """Shut down every replica."""
+        for replica in self.replicas:
+            await replica.close()
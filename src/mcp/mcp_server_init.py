@@ -3,195 +3,299 @@ MCP Server initialization module for MCP Agent system.
 Contains all MCP server setup and error handling logic.
 """
 
-import os
-import sys
 import io
+import time
+import asyncio
 from contextlib import AsyncExitStack, contextmanager
+from typing import Dict, Optional
+from google.adk.tools.base_toolset import BaseToolset
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
 from ..utils.mcp_agent_utils import print_status_message, COLOR_YELLOW, COLOR_RESET
+from ..utils.output_router import redirect_output
 from ..core.error_recovery_system import ErrorRecoverySystem, create_failure_context
+from ..config.settings import DEFAULT_SERVER_TIMEOUT, get_config
+from .connection_pool import MCPConnectionPool
+from .tool_schema_cache import ToolSchemaCache
 
 
 @contextmanager
 def suppress_output():
     """Context manager to suppress stdout and stderr output"""
-    old_stdout = sys.stdout
-    old_stderr = sys.stderr
-    try:
-        sys.stdout = io.StringIO()
-        sys.stderr = io.StringIO()
+    with redirect_output(io.StringIO(), io.StringIO()):
         yield
-    finally:
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-
-
-async def initialize_mcp_server(server_name: str, init_func, error_recovery: ErrorRecoverySystem, exit_stack: AsyncExitStack, quiet: bool = False):
-    """Helper function with enhanced error recovery for MCP server initialization"""
-    try:
-        # Suppress output during initialization to hide unwanted messages
-        with suppress_output():
-            server_instance = init_func()
-        exit_stack.push_async_callback(lambda: server_instance.close())
-        if not quiet:
-            print_status_message(f"{server_name} initialized successfully", "success", show_time=False)
+
+
+class LazyMCPToolset(BaseToolset):
+    """
+    Proxy toolset that spawns its MCP server on first use and keeps it warm.
+
+    Agents receive the proxy instead of a live MCPToolset. The underlying
+    subprocess is only started when an agent first asks for its tools (or when
+    start() is called eagerly), and is then reused for the rest of the session.
+
+    With a ToolSchemaCache a server whose tool declarations are cached starts
+    without waiting for the MCP handshake; the declarations are confirmed
+    against the live server in the background, which also opens the session
+    the first tool listing goes through.
+
+    timeout bounds the handshake of servers started on first use.
+    """
+
+    def __init__(self, server_name: str, init_func, error_recovery: ErrorRecoverySystem, quiet: bool = False, startup_times: Optional[Dict[str, float]] = None, connection_params=None, schema_cache: Optional[ToolSchemaCache] = None,
+                 timeout: float = DEFAULT_SERVER_TIMEOUT):
+        super().__init__()
+        self.server_name = server_name
+        self.timeout = timeout
+        self._init_func = init_func
+        self._error_recovery = error_recovery
+        self._quiet = quiet
+        self._startup_times = startup_times
+        self._toolset = None
+        self._start_lock = asyncio.Lock()
+        self._schema_cache = schema_cache
+        self._cache_key = None
+        self._cached_tools = None
+        self._confirm_task = None
+        if schema_cache is not None and connection_params is not None:
+            self._cache_key = schema_cache.cache_key(connection_params.command, connection_params.args)
+            self._cached_tools = schema_cache.load(server_name, self._cache_key)
+
+    @property
+    def is_started(self) -> bool:
+        """Whether the underlying MCP server has been spawned."""
+        return self._toolset is not None
+
+    async def start(self, timeout: Optional[float] = None, quiet: Optional[bool] = None) -> bool:
+        """
+        Spawn the underlying MCP server if it is not running yet.
+
+        When a timeout is given the server is also asked for its tool listing, so
+        the subprocess is actually spawned and handshaken before this returns.
+        quiet overrides the proxy's own setting for this start.
+        Returns False if the server could not be started.
+        """
+        quiet = self._quiet if quiet is None else quiet
+        async with self._start_lock:
+            if self._toolset is not None:
+                return True
+            start_time = time.monotonic()
+            server_instance = None
+            try:
+                # Suppress output during initialization to hide unwanted messages
+                with suppress_output():
+                    server_instance = self._init_func()
+                # Cached schemas let agents start now; the handshake is confirmed later
+                if timeout is not None and self._cached_tools is None:
+                    try:
+                        live_tools = await asyncio.wait_for(self._list_live_tools(server_instance), timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"{self.server_name} was not ready after {timeout:.0f}s (timeout)")
+                    if live_tools is not None and self._cache_key is not None:
+                        self._schema_cache.store(self.server_name, self._cache_key, live_tools)
+            except Exception as e:
+                if server_instance is not None:
+                    try:
+                        await server_instance.close()
+                    except Exception:
+                        pass
+                context = create_failure_context(e, tool_name=self.server_name, user_intent="initialize_mcp_server")
+                fallback_result = await self._error_recovery.handle_failure(context)
+                if not quiet:
+                    print_status_message(f"{self.server_name} failed to initialize: {fallback_result.user_message}", "warning", show_time=False)
+                return False
+
+            self._toolset = server_instance
+            elapsed = time.monotonic() - start_time
+            if self._startup_times is not None:
+                self._startup_times[self.server_name] = elapsed
+            if self._cached_tools is not None:
+                self._confirm_task = asyncio.create_task(self._confirm_cached_tools())
+            if not quiet:
+                source = " from cached tool schemas" if self._cached_tools is not None else ""
+                print_status_message(f"{self.server_name} initialized successfully{source} ({elapsed:.2f}s)", "success", show_time=False)
+            return True
+
+    async def get_tools(self, readonly_context=None):
+        """Return the tools of the underlying server, spawning it on first use."""
+        if not await self.start(timeout=self.timeout):
+            return []
+        # The toolset applies its tool filter, name prefix, ordering and auth settings
+        return await self._toolset.get_tools_with_prefix(readonly_context)
+
+    async def _list_live_tools(self, toolset):
+        """
+        Fetch the tool declarations straight from the server's MCP session.
+
+        Returns None when the toolset does not expose its session manager, in
+        which case the handshake falls back to get_tools() and nothing is cached.
+        """
+        session_manager = getattr(toolset, '_mcp_session_manager', None)
+        if session_manager is None:
+            await toolset.get_tools()
+            return None
+        session = await session_manager.create_session()
+        result = await session.list_tools()
+        return [tool.model_dump(mode='json', exclude_none=True) for tool in result.tools]
+
+    async def _confirm_cached_tools(self):
+        """Check the cached declarations against the live server and refresh the cache."""
+        try:
+            live_tools = await asyncio.wait_for(self._list_live_tools(self._toolset), self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Could not confirm; stop serving the cached declarations and force a
+            # full handshake on the next start
+            self._schema_cache.invalidate(self.server_name)
+            self._cached_tools = None
+            return
+        if live_tools is not None and live_tools != self._cached_tools:
+            self._schema_cache.store(self.server_name, self._cache_key, live_tools)
+        # From now on the live toolset answers tool listings
+        self._cached_tools = None
+
+    async def probe(self, timeout: float = DEFAULT_SERVER_TIMEOUT):
+        """
+        Ask the running server for its tool listing to check that it is responsive.
+
+        Goes through the MCP session directly when available so a cached tool list
+        cannot hide a dead subprocess. Raises if the server is not started or fails.
+        """
+        if self._toolset is None:
+            raise RuntimeError(f"{self.server_name} is not started")
+        session_manager = getattr(self._toolset, '_mcp_session_manager', None)
+        if session_manager is not None:
+            async def list_tools():
+                session = await session_manager.create_session()
+                await session.list_tools()
+            await asyncio.wait_for(list_tools(), timeout)
+        else:
+            await asyncio.wait_for(self._toolset.get_tools(), timeout)
+
+    async def restart(self, timeout: float = DEFAULT_SERVER_TIMEOUT, quiet: Optional[bool] = None) -> bool:
+        """Tear down the underlying server and spawn a fresh one."""
+        try:
+            await self.close()
+        except Exception:
+            # A crashed subprocess may fail to close cleanly; start over regardless
+            self._toolset = None
+        return await self.start(timeout=timeout, quiet=quiet)
+
+    async def close(self):
+        """Shut down the underlying MCP server if it was started."""
+        if self._confirm_task is not None:
+            self._confirm_task.cancel()
+            self._confirm_task = None
+        if self._toolset is not None:
+            toolset, self._toolset = self._toolset, None
+            await toolset.close()
+
+
+async def initialize_mcp_server(server_name: str, init_func, error_recovery: ErrorRecoverySystem, exit_stack: AsyncExitStack, quiet: bool = False, lazy: bool = False, timeout: Optional[float] = None, startup_times: Optional[Dict[str, float]] = None, connection_params=None, schema_cache: Optional[ToolSchemaCache] = None):
+    """
+    Helper function with enhanced error recovery for MCP server initialization.
+
+    Returns a LazyMCPToolset registered with the exit stack. Lazy proxies are
+    returned without spawning anything; otherwise the server is started now and
+    None is returned if that fails.
+    """
+    server_instance = LazyMCPToolset(server_name, init_func, error_recovery, quiet=quiet, startup_times=startup_times,
+                                     connection_params=connection_params, schema_cache=schema_cache,
+                                     timeout=timeout if timeout is not None else DEFAULT_SERVER_TIMEOUT)
+    exit_stack.push_async_callback(server_instance.close)
+    if lazy:
         return server_instance
-    except Exception as e:
-        context = create_failure_context(e, tool_name=server_name, user_intent="initialize_mcp_server")
-        fallback_result = await error_recovery.handle_failure(context)
-        if not quiet:
-            print_status_message(f"{server_name} failed to initialize: {fallback_result.user_message}", "warning", show_time=False)
+    if not await server_instance.start(timeout=timeout):
         return None
+    return server_instance
+
+
+async def initialize_all_mcp_servers(error_recovery: ErrorRecoverySystem, exit_stack: AsyncExitStack, quiet: bool = False, startup_mode: str = "concurrent", timeout: float = DEFAULT_SERVER_TIMEOUT, startup_times: Optional[Dict[str, float]] = None, schema_cache: Optional[ToolSchemaCache] = None, profile: Optional[str] = None, pool_size: int = 1, pool_concurrency: int = 1):
+    """
+    Initialize the MCP servers of a profile and return them as a dictionary of toolset proxies.
+
+    Servers come from the settings registry (AgentConfig.mcp_servers); profile
+    selects a named subset (see MCP_PROFILES) and defaults to the configured
+    one. Servers whose command, scripts or required environment variables are
+    missing are skipped before any spawn attempt and left out of the result.
+
+    In concurrent mode every server is spawned at once and awaited with a
+    per-server timeout, so startup takes about as long as the slowest server.
+    Sequential mode spawns and handshakes the servers one after another, with
+    the same per-server timeout. Lazy mode
+    spawns nothing up front; each server starts the first time its agent needs it.
+
+    With a schema_cache, servers whose tool declarations are cached skip the
+    startup handshake and are confirmed in the background instead.
+
+    With pool_size > 1 each server is wrapped in an MCPConnectionPool of that
+    many replicas, each running at most pool_concurrency calls at a time. Only
+    the primary replica follows startup_mode; the others spawn when needed.
+    """
+    if startup_times is None:
+        startup_times = {}
+
+    # (result key, display name, connection parameters) for every server, in startup order
+    server_specs = []
+    for key, server in get_config().servers_for_profile(profile).items():
+        missing = server.missing_requirements()
+        if missing:
+            if not quiet:
+                print(f"{COLOR_YELLOW}Skipping {server.display_name}: {'; '.join(missing)}{COLOR_RESET}")
+            continue
+        server_specs.append((
+            key,
+            server.display_name,
+            StdioServerParameters(
+                command=server.command,
+                args=[str(arg) for arg in server.args],
+                env=dict(server.env),
+                cwd=server.working_dir,
+            ),
+        ))
+
+    overall_start = time.monotonic()
+
+    def make_init_func(params):
+        return lambda: MCPToolset(connection_params=params)
+
+    async def initialize(server_name, params, **kwargs):
+        # The timeout also bounds servers that only start on first use
+        primary = await initialize_mcp_server(server_name, make_init_func(params), error_recovery, exit_stack, quiet,
+                                              timeout=timeout, startup_times=startup_times, connection_params=params,
+                                              schema_cache=schema_cache, **kwargs)
+        if primary is None or pool_size <= 1:
+            return primary
+        # Extra replicas start quietly on demand once the warm ones are busy
+        replicas = [primary]
+        for _ in range(pool_size - 1):
+            replicas.append(await initialize_mcp_server(
+                server_name, make_init_func(params), error_recovery, exit_stack, quiet=True, lazy=True,
+                timeout=timeout, connection_params=params, schema_cache=schema_cache
+            ))
+        return MCPConnectionPool(server_name, replicas, max_concurrency=pool_concurrency)
+
+    if startup_mode == "lazy":
+        server_instances = [
+            await initialize(server_name, params, lazy=True)
+            for _, server_name, params in server_specs
+        ]
+    elif startup_mode == "concurrent":
+        server_instances = await asyncio.gather(*(
+            initialize(server_name, params)
+            for _, server_name, params in server_specs
+        ))
+    else:
+        server_instances = []
+        for _, server_name, params in server_specs:
+            server_instances.append(await initialize(server_name, params))
 
+    if not quiet and startup_times:
+        slowest_name = max(startup_times, key=startup_times.get)
+        print_status_message(
+            f"MCP servers ready in {time.monotonic() - overall_start:.2f}s "
+            f"(slowest: {slowest_name} {startup_times[slowest_name]:.2f}s)",
+            "info", show_time=False
+        )
 
-async def initialize_all_mcp_servers(error_recovery: ErrorRecoverySystem, exit_stack: AsyncExitStack, quiet: bool = False):
-    """Initialize all MCP servers and return them as a dictionary."""
-    
-    # Initialize filesystem server
-    mcp_toolset_instance_filesystem = await initialize_mcp_server(
-        "filesystem_server",
-        lambda: MCPToolset(
-            connection_params=StdioServerParameters(
-                command='npx',
-                args=["-y", "@modelcontextprotocol/server-filesystem",
-                      os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "agent_files")],
-            )
-        ),
-        error_recovery,
-        exit_stack,
-        quiet
-    )
-
-    # Initialize code executor server
-    code_storage_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "agent_files")
-    mcp_toolset_instance_code_executor = await initialize_mcp_server(
-        "code_executor_server",
-        lambda: MCPToolset(
-            connection_params=StdioServerParameters(
-                command='env',
-                args=[
-                    f"CODE_STORAGE_DIR={code_storage_dir}",
-                    "ENV_TYPE=venv",
-                    f"VENV_PATH={os.path.join(os.getcwd(), '.mcp_venv')}",
-                    "node",
-                    "/Users/milanboonstra/code/openaisdkmcp_server_copy/mcp_code_executor/build/index.js"
-                ],
-                env={}
-            )
-        ),
-        error_recovery,
-        exit_stack,
-        quiet
-    )
-
-    # Initialize content scraper server
-    mcp_toolset_instance_content_scraper = await initialize_mcp_server(
-        "content_scraper_server",
-        lambda: MCPToolset(
-            connection_params=StdioServerParameters(
-                command='node',
-                args=["/Users/milanboonstra/Documents/Cline/MCP/contentscraper-mcp-server/build/index.js"],
-            )
-        ),
-        error_recovery,
-        exit_stack,
-        quiet
-    )
-
-    # Initialize fetch server
-    mcp_toolset_instance_fetch = await initialize_mcp_server(
-        "fetch_server",
-        lambda: MCPToolset(
-            connection_params=StdioServerParameters(
-                command='node',
-                args=["/Users/milanboonstra/Documents/Cline/MCP/fetch-server/build/index.js"],
-            )
-        ),
-        error_recovery,
-        exit_stack,
-        quiet
-    )
-
-    # Check for Perplexity API key and warn if missing
-    perplexity_api_key = os.getenv("PERPLEXITY_API_KEY")
-    if not perplexity_api_key and not quiet:
-        print(f"{COLOR_YELLOW}Warning: PERPLEXITY_API_KEY is not set in .env. Perplexity MCP server might fail.{COLOR_RESET}")
-
-    # Initialize Perplexity server
-    mcp_toolset_instance_perplexity = await initialize_mcp_server(
-        "perplexity_server",
-        lambda: MCPToolset(
-            connection_params=StdioServerParameters(
-                command='env',
-                args=[
-                    f"PERPLEXITY_API_KEY={perplexity_api_key}",
-                    "node",
-                    "/Users/milanboonstra/Documents/Cline/MCP/perplexity-mcp/build/index.js"
-                ],
-                env={}
-            )
-        ),
-        error_recovery,
-        exit_stack,
-        quiet
-    )
-
-    # Check for Telegram bot tokens and warn if missing
-    telegram_bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    default_chat_id = os.getenv("DEFAULT_CHAT_ID")
-    if (not telegram_bot_token or not default_chat_id) and not quiet:
-        print(f"{COLOR_YELLOW}Warning: TELEGRAM_BOT_TOKEN or DEFAULT_CHAT_ID is not set in .env. Telegram MCP server might fail.{COLOR_RESET}")
-
-    # Initialize Telegram server
-    mcp_toolset_instance_telegram = await initialize_mcp_server(
-        "telegram_server",
-        lambda: MCPToolset(
-            connection_params=StdioServerParameters(
-                command='env',
-                args=[
-                    f"TELEGRAM_BOT_TOKEN={telegram_bot_token}",
-                    f"DEFAULT_CHAT_ID={default_chat_id}",
-                    "node",
-                    "/Users/milanboonstra/Documents/Cline/MCP/telegram-server/build/index.js"
-                ],
-                env={}
-            )
-        ),
-        error_recovery,
-        exit_stack,
-        quiet
-    )
-
-    # Check for Google API key and warn if missing
-    google_api_key = os.getenv("GOOGLE_API_KEY")
-    if not google_api_key and not quiet:
-        print(f"{COLOR_YELLOW}Warning: GOOGLE_API_KEY is not set in .env. Gemini Research MCP server might fail.{COLOR_RESET}")
-
-    # Initialize Gemini Research server
-    mcp_toolset_instance_gemini_research = await initialize_mcp_server(
-        "gemini_research_agent",
-        lambda: MCPToolset(
-            connection_params=StdioServerParameters(
-                command='sh',
-                    args=[
-                        '-c',
-                        # GEMINI_API_KEY is inherited from the env passed to StdioServerParameters
-                        'cd "/Users/milanboonstra/code/gemini-research-agent-mcp/" && exec node --enable-source-maps "/Users/milanboonstra/code/gemini-research-agent-mcp/dist/index.js"'
-                    ],
-                    env={"GEMINI_API_KEY": google_api_key} if google_api_key else {}
-            )
-        ),
-        error_recovery,
-        exit_stack,
-        quiet
-    )
-
-    return {
-        'filesystem': mcp_toolset_instance_filesystem,
-        'code_executor': mcp_toolset_instance_code_executor,
-        'content_scraper': mcp_toolset_instance_content_scraper,
-        'fetch': mcp_toolset_instance_fetch,
-        'perplexity': mcp_toolset_instance_perplexity,
-        'telegram': mcp_toolset_instance_telegram,
-        'gemini_research': mcp_toolset_instance_gemini_research
-    }
+    return {key: server_instance for (key, _, _), server_instance in zip(server_specs, server_instances)}
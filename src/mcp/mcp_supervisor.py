@@ -0,0 +1,186 @@
+"""
+MCP server supervisor for long-running sessions.
+Periodically probes every started MCP toolset and restarts crashed or hung
+servers with exponential backoff.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Optional
+
+from ..utils.mcp_agent_utils import (
+    print_section_header, print_status_message,
+    COLOR_CYAN, COLOR_DIM, COLOR_RESET
+)
+
+
+class ServerState(Enum):
+    """Health states of a supervised MCP server"""
+    STARTING = "starting"
+    HEALTHY = "healthy"
+    DEGRADED = "degraded"
+    DOWN = "down"
+
+
+@dataclass
+class ServerHealth:
+    """Health information about a single supervised MCP server"""
+    name: str
+    state: ServerState = ServerState.STARTING
+    consecutive_failures: int = 0
+    restarts: int = 0
+    restart_attempts: int = 0
+    next_restart_at: float = 0.0
+    last_probe: Optional[datetime] = None
+    last_latency: Optional[float] = None
+    last_error: Optional[str] = None
+
+
+class MCPSupervisor:
+    """
+    Background task that keeps MCP servers alive.
+
+    Only servers that have been started are probed, so lazily started servers
+    are left alone until their agent first uses them. A failed probe marks the
+    server degraded; after failure_threshold consecutive failures it is marked
+    down and restarted, backing off exponentially between attempts.
+    """
+
+    def __init__(self, toolsets: Dict, probe_interval: float = 30.0, probe_timeout: float = 10.0,
+                 restart_timeout: float = 30.0, failure_threshold: int = 2, max_backoff: float = 300.0,
+                 quiet: bool = False, output=None):
+        """
+        Args:
+            toolsets: Mapping of server keys to LazyMCPToolset proxies (None entries are ignored)
+            probe_interval: Seconds between health probe rounds
+            probe_timeout: Seconds a single list-tools probe may take
+            restart_timeout: Seconds a restarted server may take to become ready
+            failure_threshold: Consecutive failed probes before a server is considered down
+            max_backoff: Upper bound in seconds between restart attempts
+            quiet: Suppress state change messages
+            output: Stream for state change messages (defaults to sys.stdout)
+        """
+        self.toolsets = {key: toolset for key, toolset in toolsets.items() if toolset is not None}
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.restart_timeout = restart_timeout
+        self.failure_threshold = failure_threshold
+        self.max_backoff = max_backoff
+        self.quiet = quiet
+        self.output = output
+        self.health: Dict[str, ServerHealth] = {key: ServerHealth(name=key) for key in self.toolsets}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the supervision loop in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the supervision loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self.check_all()
+
+    async def check_all(self):
+        """Probe every started server once and restart the ones that are down."""
+        await asyncio.gather(*(self._check(key) for key in self.toolsets))
+
+    async def _check(self, key: str):
+        toolset = self.toolsets[key]
+        health = self.health[key]
+
+        if health.state == ServerState.DOWN:
+            if time.monotonic() >= health.next_restart_at:
+                await self._restart(key)
+            return
+
+        if not toolset.is_started:
+            return
+
+        start_time = time.monotonic()
+        try:
+            await toolset.probe(timeout=self.probe_timeout)
+        except Exception as e:
+            health.last_probe = datetime.now()
+            health.last_error = str(e) or type(e).__name__
+            health.consecutive_failures += 1
+            if health.consecutive_failures >= self.failure_threshold:
+                health.next_restart_at = time.monotonic()
+                self._set_state(health, ServerState.DOWN)
+                await self._restart(key)
+            else:
+                self._set_state(health, ServerState.DEGRADED)
+            return
+
+        health.last_probe = datetime.now()
+        health.last_latency = time.monotonic() - start_time
+        health.last_error = None
+        health.consecutive_failures = 0
+        self._set_state(health, ServerState.HEALTHY)
+
+    async def _restart(self, key: str):
+        """Restart a server that is down, scheduling the next attempt on failure."""
+        health = self.health[key]
+        health.restart_attempts += 1
+        # Restarts report through the supervisor's state changes, not the proxy
+        if await self.toolsets[key].restart(timeout=self.restart_timeout, quiet=True):
+            health.restarts += 1
+            health.restart_attempts = 0
+            health.consecutive_failures = 0
+            health.last_error = None
+            self._set_state(health, ServerState.HEALTHY)
+        else:
+            health.last_error = "restart failed"
+            backoff = min(self.probe_interval * 2 ** (health.restart_attempts - 1), self.max_backoff)
+            health.next_restart_at = time.monotonic() + backoff
+
+    def _set_state(self, health: ServerHealth, state: ServerState):
+        if health.state == state:
+            return
+        previous = health.state
+        health.state = state
+        if self.quiet or (previous == ServerState.STARTING and state == ServerState.HEALTHY):
+            return
+        status_types = {
+            ServerState.HEALTHY: "success",
+            ServerState.DEGRADED: "warning",
+            ServerState.DOWN: "error",
+        }
+        message = f"MCP server {health.name} is {state.value}"
+        if health.last_error:
+            message += f" ({health.last_error})"
+        print_status_message(message, status_types.get(state, "info"), file=self.output)
+
+    def get_states(self) -> Dict[str, ServerState]:
+        """Return the current state of every supervised server."""
+        return {key: health.state for key, health in self.health.items()}
+
+    def print_status(self):
+        """Print a table with the health of every supervised server."""
+        print_section_header("MCP Server Health", width=50)
+        for key, health in self.health.items():
+            if not self.toolsets[key].is_started and health.state == ServerState.STARTING:
+                print(f"{COLOR_DIM}  {key:<18} not started{COLOR_RESET}")
+                continue
+            details = []
+            if health.last_latency is not None:
+                details.append(f"probe {health.last_latency * 1000:.0f}ms")
+            if health.restarts:
+                details.append(f"restarts {health.restarts}")
+            if health.last_error:
+                details.append(health.last_error)
+            print(f"{COLOR_CYAN}  {key:<18} {health.state.value:<9}{COLOR_RESET} {COLOR_DIM}{', '.join(details)}{COLOR_RESET}")
+        print()
@@ -0,0 +1,87 @@
+"""
+On-disk cache of MCP tool declarations for warm starts.
+
+Each server's tool list is stored under data/mcp_tool_cache/, keyed by the
+server command, its arguments and the modification times of the binaries and
+scripts they reference. A changed command line or a rebuilt server therefore
+produces a different key and the stale entry is ignored.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Absolute paths embedded in arguments such as `sh -c 'cd /x && node /x/index.js'`
+_ABSOLUTE_PATH_PATTERN = re.compile(r'(/[^\s"\'&;|]+)')
+
+
+def _file_mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class ToolSchemaCache:
+    """Stores MCP tool declarations per server so agents can start without a handshake."""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "mcp_tool_cache")
+        self.cache_dir = cache_dir
+
+    def cache_key(self, command: str, args: List[str]) -> str:
+        """Build a key from the command line and the mtimes of the files it references."""
+        referenced_files = {}
+        command_path = shutil.which(command)
+        if command_path:
+            referenced_files[command_path] = _file_mtime(command_path)
+        for arg in args:
+            for candidate in _ABSOLUTE_PATH_PATTERN.findall(str(arg)):
+                if os.path.isfile(candidate):
+                    referenced_files[candidate] = _file_mtime(candidate)
+        fingerprint = json.dumps(
+            {"command": command, "args": [str(arg) for arg in args], "files": referenced_files},
+            sort_keys=True
+        )
+        return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+    def _path(self, server_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{server_name}.json")
+
+    def load(self, server_name: str, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached tool declarations, or None if missing or stale."""
+        try:
+            with open(self._path(server_name), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if entry.get("key") != key or not isinstance(entry.get("tools"), list):
+            return None
+        return entry["tools"]
+
+    def store(self, server_name: str, key: str, tools: List[Dict[str, Any]]):
+        """Write the tool declarations for a server, replacing any previous entry."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            "server": server_name,
+            "key": key,
+            "updated_at": datetime.now().isoformat(),
+            "tools": tools,
+        }
+        # Write atomically so a concurrent reader never sees a partial file
+        tmp_path = self._path(server_name) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_path, self._path(server_name))
+
+    def invalidate(self, server_name: str):
+        """Drop the cached entry for a server."""
+        try:
+            os.remove(self._path(server_name))
+        except OSError:
+            pass
@@ -0,0 +1,199 @@
+"""
+Map-reduce processing of inputs that are too large for one request.
+
+Each chunk of an oversized input is analyzed concurrently in its own
+ephemeral session (map), so the chunks neither wait for each other nor pile
+up in the conversation. The partial answers are then combined into a single
+answer (reduce), which is recorded in the main session. Both steps run on a
+tool-less analyst agent (see create_chunk_analyst_agent), so text inside the
+input can never trigger tools such as file writes or Telegram messages. A
+semaphore bounds how many chunks run at once.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from google.adk.events.event import Event
+from google.genai import types
+
+# Characters of the start of the message repeated with every chunk, so each
+# part is read in light of the request that usually opens the message
+REQUEST_EXCERPT_CHARS = 1000
+
+MAP_PROMPT = (
+    "This is part {number} of {total} of a message from the user that is too long to read at once. "
+    "The other parts are analyzed separately and your notes will be combined afterwards. "
+    "Extract everything in this part that matters for the user's request: key facts, figures, "
+    "names, conclusions and a short summary of the content. Reply with the notes only."
+)
+
+REDUCE_PROMPT = (
+    "My last message was too long to process at once, so it was split into {total} parts "
+    "and each part was analyzed separately. The notes on every part are below. Respond to "
+    "my message as if you had read it in full."
+)
+
+
+@dataclass
+class ChunkResult:
+    """Outcome of the map step for one chunk."""
+    index: int
+    text: str = ""
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+def collect_response_text(events) -> str:
+    """Return the text of the final responses among a run's events."""
+    texts = []
+    for event in events:
+        if event.author == 'user' or not event.content or not event.content.parts:
+            continue
+        if event.is_final_response():
+            texts.extend(part.text for part in event.content.parts if part.text and not part.thought)
+    return "\n".join(texts).strip()
+
+
+class ChunkMapReducer:
+    """Runs the chunks of one large input through a tool-less agent in parallel sessions."""
+
+    def __init__(self, runner, user_id: str, max_concurrency: int = 4,
+                 on_progress: Optional[Callable[[ChunkResult, int, int], None]] = None):
+        """
+        Args:
+            runner: ADK runner of the tool-less analyst agent; its session service
+                holds the ephemeral sessions
+            user_id: User the ephemeral sessions belong to
+            max_concurrency: Chunks analyzed at the same time
+            on_progress: Called with (result, completed, total) as each chunk finishes
+        """
+        self.runner = runner
+        self.session_service = runner.session_service
+        self.user_id = user_id
+        self.max_concurrency = max(1, max_concurrency)
+        self.on_progress = on_progress
+        # Final answer text of the last reduce_events run
+        self.last_answer = ""
+
+    @staticmethod
+    def _excerpt(message: str) -> str:
+        if len(message) <= REQUEST_EXCERPT_CHARS:
+            return message
+        return message[:REQUEST_EXCERPT_CHARS] + " ..."
+
+    def build_map_prompt(self, chunk: str, index: int, total: int, message: str) -> str:
+        """Build the prompt that analyzes a single chunk."""
+        sections = [MAP_PROMPT.format(number=index + 1, total=total)]
+        if index > 0:
+            # The first part already starts with the request
+            sections.append(f"The message starts with:\n{self._excerpt(message)}")
+        sections.append(f"--- Part {index + 1}/{total} ---\n{chunk}")
+        return "\n\n".join(sections)
+
+    def map_overhead_text(self, message: str) -> str:
+        """
+        Return the text sent with every chunk besides the chunk itself.
+
+        Its tokens must be subtracted from the chunk budget so a full chunk
+        plus the prompt still fits the context limit.
+        """
+        instruction = getattr(self.runner.agent, 'instruction', '')
+        instruction = instruction if isinstance(instruction, str) else ''
+        return instruction + "\n" + self.build_map_prompt("", 1, 2, message)
+
+    def build_reduce_prompt(self, results: List[ChunkResult], message: str) -> str:
+        """Build the prompt that combines the notes on every chunk."""
+        total = len(results)
+        sections = [
+            REDUCE_PROMPT.format(total=total),
+            f"The message starts with:\n{self._excerpt(message)}",
+        ]
+        for result in sorted(results, key=lambda r: r.index):
+            if result.error:
+                notes = f"(This part could not be analyzed: {result.error})"
+            else:
+                notes = result.text or "(No notes for this part.)"
+            sections.append(f"--- Notes on part {result.index + 1}/{total} ---\n{notes}")
+        return "\n\n".join(sections)
+
+    async def _run_ephemeral(self, content: types.Content, run_config=None):
+        """Yield the events of one run of the analyst in a session that is deleted afterwards."""
+        session = await self.session_service.create_session(
+            state={}, app_name=self.runner.app_name, user_id=self.user_id
+        )
+        try:
+            async for event in self.runner.run_async(
+                session_id=session.id, user_id=self.user_id, new_message=content, run_config=run_config
+            ):
+                yield event
+        finally:
+            await self.session_service.delete_session(
+                app_name=self.runner.app_name, user_id=self.user_id, session_id=session.id
+            )
+
+    async def _run_chunk(self, prompt: str) -> str:
+        content = types.Content(role='user', parts=[types.Part(text=prompt)])
+        return collect_response_text([event async for event in self._run_ephemeral(content)])
+
+    async def map_chunks(self, chunks: List[str], message: str) -> List[ChunkResult]:
+        """
+        Analyze every chunk concurrently and return the results in chunk order.
+
+        A failing chunk is reported in its result instead of failing the others.
+        """
+        total = len(chunks)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        completed = 0
+
+        async def run(index: int, chunk: str) -> ChunkResult:
+            nonlocal completed
+            async with semaphore:
+                result = ChunkResult(index=index)
+                start = time.monotonic()
+                try:
+                    result.text = await self._run_chunk(self.build_map_prompt(chunk, index, total, message))
+                except Exception as e:
+                    result.error = str(e) or type(e).__name__
+                result.elapsed = time.monotonic() - start
+            completed += 1
+            if self.on_progress:
+                self.on_progress(result, completed, total)
+            return result
+
+        return list(await asyncio.gather(*(run(index, chunk) for index, chunk in enumerate(chunks))))
+
+    async def run(self, chunks: List[str], message: str) -> types.Content:
+        """Map the chunks and return the reduce message that combines them."""
+        results = await self.map_chunks(chunks, message)
+        return types.Content(role='user', parts=[types.Part(text=self.build_reduce_prompt(results, message))])
+
+    async def reduce_events(self, content: types.Content, run_config=None):
+        """
+        Yield the events of the analyst answering the reduce message.
+
+        The answer text is kept in last_answer once the events are consumed.
+        """
+        self.last_answer = ""
+        events = []
+        async for event in self._run_ephemeral(content, run_config):
+            if not event.partial:
+                events.append(event)
+            yield event
+        self.last_answer = collect_response_text(events)
+
+    async def record_exchange(self, session_service, session, content: types.Content, author: str):
+        """Append the reduce message and the last answer to the main session, so later turns can refer to them."""
+        if not self.last_answer:
+            return
+        current = await session_service.get_session(
+            app_name=session.app_name, user_id=session.user_id, session_id=session.id
+        )
+        if current is None:
+            return
+        await session_service.append_event(current, Event(author='user', content=content))
+        await session_service.append_event(current, Event(
+            author=author,
+            content=types.Content(role='model', parts=[types.Part(text=self.last_answer)]),
+        ))
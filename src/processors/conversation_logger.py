@@ -40,13 +40,16 @@ class ConversationLogger:
             "timestamp": datetime.now().isoformat()
         })
         
-    def add_tool_call(self, tool_name: str, args: Dict[str, Any], result: str):
+    def add_tool_call(self, tool_name: str, args: Dict[str, Any], result: str,
+                      duration: Optional[float] = None, status: Optional[str] = None):
         """Add a tool call to the conversation history."""
         self.conversation_history.append({
             "type": "tool_call",
             "tool": tool_name,
             "arguments": args,
             "result": result,
+            "duration_seconds": duration,
+            "status": status,
             "timestamp": datetime.now().isoformat()
         })
         
@@ -128,7 +131,12 @@ class ConversationLogger:
                 lines.append("")
                 
             elif entry['type'] == 'tool_call':
-                lines.append(f"#### 🔧 Tool Call: `{entry['tool']}` [{timestamp}]")
+                details = [timestamp]
+                if entry.get('duration_seconds') is not None:
+                    details.append(f"{entry['duration_seconds']:.2f}s")
+                if entry.get('status') == 'error':
+                    details.append("error")
+                lines.append(f"#### 🔧 Tool Call: `{entry['tool']}` [{', '.join(details)}]")
                 lines.append("")
                 lines.append("**Arguments:**")
                 lines.append("```json")
@@ -3,27 +3,48 @@ Event processing module for MCP Agent system.
 Contains all event handling and response processing logic.
 """
 
+import asyncio
+import sys
+
 from ..utils.mcp_agent_utils import (
     COLOR_YELLOW, COLOR_CYAN, COLOR_MAGENTA, COLOR_RESET,
     COLOR_BLUE, COLOR_DIM, SYMBOL_SUCCESS, SYMBOL_WARNING, SYMBOL_THINKING,
     SYMBOL_TOOL, SYMBOL_SEARCH, SYMBOL_INFO, pretty_print_json_string,
-    print_section_header, print_status_message, format_tool_response,
+    print_section_header, print_status_message, format_tool_response, bounded_text,
     ConversationStats
 )
 from ..core.error_recovery_system import ErrorRecoverySystem, create_failure_context
+from ..core.tool_call_tracker import ToolCallTracker
 from ..utils.telegram_formatter import markdown_to_plain_text
 from ..utils.compact_formatter import format_compact
+from ..utils.output_router import drain_output
 from ..ui.shell_ui import ShellUI
+from ..ui.stream_renderer import StreamingTextRenderer
+
+# Events that may wait for the renderer before the runner is paused
+RENDER_QUEUE_SIZE = 256
+# Events rendered before the renderer flushes and yields to the runner
+RENDER_BATCH_SIZE = 64
+# Characters of a tool result kept for the conversation log
+LOG_RESULT_CHARS = 5000
 
 
-async def process_events(events_async, error_recovery_system: ErrorRecoverySystem, stats: ConversationStats = None, conversation_logger = None, loading_indicator = None, shell_mode: bool = False):
+async def process_events(events_async, error_recovery_system: ErrorRecoverySystem, stats: ConversationStats = None, conversation_logger = None, loading_indicator = None, shell_mode: bool = False,
+                         tool_tracker: ToolCallTracker = None):
     """Process events from the agent response with comprehensive error handling."""
     response_time = None
     assistant_response_parts = []
     first_event = True
     tools_used = set()  # Track unique tools used
-    try:
-        async for event in events_async:
+    if tool_tracker is None:
+        tool_tracker = ToolCallTracker()
+    # Renders partial events when the runner streams (RunConfig with StreamingMode.SSE)
+    renderer = StreamingTextRenderer(shell_mode=shell_mode)
+
+    def render_batch(events):
+        """Format and print a batch of events."""
+        nonlocal first_event
+        for event in events:
             # Stop loading indicator on first event to prevent display interference
             if first_event:
                 first_event = False
@@ -33,10 +54,23 @@ async def process_events(events_async, error_recovery_system: ErrorRecoverySyste
                     # Clear the "Working..." line
                     print("\r" + " " * 50 + "\r", end="")
                     print()
+            if event.partial:
+                # A piece of a streamed response: show it as soon as it arrives
+                if event.content and event.content.parts:
+                    for part in event.content.parts:
+                        if part.text:
+                            renderer.feed(part.text)
+                continue
+            # The complete event that follows the streamed pieces repeats their text
+            streamed = renderer.active
+            renderer.finish()
             has_printed_content = False
             if event.content and event.content.parts:
                 for part in event.content.parts:
-                    if part.text:
+                    if part.text and streamed:
+                        has_printed_content = True
+                        assistant_response_parts.append(part.text)
+                    elif part.text:
                         if not shell_mode:
                             print_section_header("Agent Response", width=50)
                         else:
@@ -63,20 +97,11 @@ async def process_events(events_async, error_recovery_system: ErrorRecoverySyste
                             print() # Add blank line for separation
                         has_printed_content = True
                         
-                        # Log tool call if logger available
-                        if conversation_logger:
-                            import json
-                            try:
-                                args_dict = json.loads(part.function_call.args)
-                            except:
-                                args_dict = {"raw_args": part.function_call.args}
-                            # Store tool call info for later when we get the response
-                            if not hasattr(process_events, 'pending_tool_call'):
-                                process_events.pending_tool_call = {}
-                            process_events.pending_tool_call = {
-                                "name": part.function_call.name,
-                                "args": args_dict
-                            }
+                        # Correlate by call id: one event may hold several parallel calls
+                        tool_tracker.start(
+                            part.function_call.id, part.function_call.name, part.function_call.args or {},
+                            invocation_id=event.invocation_id, agent=event.author, started_at=event.timestamp
+                        )
                     if part.function_response:
                         # Assuming function_response.response might contain a 'name' if it's structured,
                         # otherwise, it might be a simple string or dict.
@@ -88,28 +113,26 @@ async def process_events(events_async, error_recovery_system: ErrorRecoverySyste
                         # The actual response content is in part.function_response.response
                         # This 'response' field itself can be a dict containing 'content' or other structured data.
                         actual_response_data = part.function_response.response
+                        shown_data = actual_response_data
+                        if isinstance(actual_response_data, dict) and 'content' in actual_response_data:
+                            shown_data = actual_response_data['content']
                         if not shell_mode:
-                            if isinstance(actual_response_data, dict) and 'content' in actual_response_data:
-                                format_tool_response(tool_name_for_response, actual_response_data['content'])
-                                response_str = str(actual_response_data['content'])
-                            else:
-                                format_tool_response(tool_name_for_response, actual_response_data)
-                                response_str = str(actual_response_data)
-                        else:
-                            if isinstance(actual_response_data, dict) and 'content' in actual_response_data:
-                                response_str = str(actual_response_data['content'])
-                            else:
-                                response_str = str(actual_response_data)
+                            format_tool_response(tool_name_for_response, shown_data)
+                        # The conversation export shows at most LOG_RESULT_CHARS of a result
+                        response_str = bounded_text(shown_data, LOG_RESULT_CHARS)
                         has_printed_content = True
                         
+                        record = tool_tracker.finish(
+                            part.function_response.id, tool_name_for_response, response=actual_response_data,
+                            invocation_id=event.invocation_id, ended_at=event.timestamp
+                        )
+
                         # Log tool response if logger available
-                        if conversation_logger and hasattr(process_events, 'pending_tool_call'):
+                        if conversation_logger:
                             conversation_logger.add_tool_call(
-                                process_events.pending_tool_call["name"],
-                                process_events.pending_tool_call["args"],
-                                response_str
+                                record.name, record.args, response_str,
+                                duration=record.duration, status=record.status
                             )
-                            delattr(process_events, 'pending_tool_call')
             
             # Display grounding metadata if available
             if hasattr(event, 'candidates') and event.candidates:
@@ -201,7 +224,51 @@ async def process_events(events_async, error_recovery_system: ErrorRecoverySyste
                 except Exception as e:
                     print(f"{COLOR_MAGENTA}Error displaying event: {e}{COLOR_RESET}")
                 print() # Add blank line for separation
+
+    # The runner's events are queued for a renderer task on the event loop. It
+    # renders whatever has arrived in one batch, flushes once and yields, so the
+    # runner keeps pulling events instead of waiting on every print
+    render_queue: asyncio.Queue = asyncio.Queue(maxsize=RENDER_QUEUE_SIZE)
+
+    async def render_events():
+        """Render queued events in batches until the end marker; return the first rendering error."""
+        render_error = None
+        while True:
+            batch = [await render_queue.get()]
+            while batch[-1] is not None and len(batch) < RENDER_BATCH_SIZE and not render_queue.empty():
+                batch.append(render_queue.get_nowait())
+            finished = batch[-1] is None
+            events = [event for event in batch if event is not None]
+            # After a failure keep draining so the producer never blocks on a full queue
+            if events and render_error is None:
+                try:
+                    render_batch(events)
+                    sys.stdout.flush()
+                except Exception as e:
+                    render_error = e
+                # Hold the runner back while a daemon client reads slower than
+                # it produces, and let it make progress before the next batch
+                await drain_output()
+                await asyncio.sleep(0)
+            if finished:
+                return render_error
+
+    try:
+        render_task = asyncio.create_task(render_events())
+        try:
+            async for event in events_async:
+                await render_queue.put(event)
+        finally:
+            await render_queue.put(None)
+            render_error = await render_task
+        if render_error is not None:
+            raise render_error
+        # A stream that ended without its complete event
+        if renderer.active:
+            assistant_response_parts.append(renderer.text)
+            renderer.finish()
     except Exception as e:
+        renderer.finish()
         # Enhanced error handling with recovery suggestions
         context = create_failure_context(e, tool_name="event_processor", user_intent="process_agent_response")
         fallback_result = await error_recovery_system.handle_failure(context)
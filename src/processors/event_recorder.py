@@ -0,0 +1,217 @@
+"""
+Recording and offline replay of the runner's event stream.
+
+EventRecorder wraps the async event iterator of a turn and appends every
+event, with its offset from the start of the turn, to a compact JSONL file.
+EventReplay feeds a recorded turn back as an async iterator, either as fast
+as it is consumed or with the original timing, so process_events, the
+formatters and the conversation logger can be benchmarked deterministically
+without an LLM, MCP servers or a network (see replay_recording).
+
+Each line of a recording is one JSON object tagged with the turn it belongs
+to, so turns that run concurrently (e.g. daemon queries) can share a file:
+
+    {"turn": "<id>", "query": "...", "started_at": <epoch seconds>}
+    {"turn": "<id>", "t": <seconds since start>, "event": {<ADK Event>}}
+    {"turn": "<id>", "t": <seconds since start>, "error": "<exception>"}
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from google.adk.events.event import Event
+
+from ..utils.mcp_agent_utils import (
+    COLOR_BOLD, COLOR_CYAN, COLOR_DIM, COLOR_RESET,
+    print_section_header, print_status_message, ConversationStats
+)
+from ..core.error_recovery_system import ErrorRecoverySystem
+from ..core.tool_call_tracker import ToolCallTracker
+from .conversation_logger import ConversationLogger
+from .event_processor import process_events
+
+
+class RecordedRunError(RuntimeError):
+    """Raised during replay where the recorded run failed."""
+
+
+class EventRecorder:
+    """Appends the events of each turn to a JSONL file as they pass through."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def _write(self, line: str):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        # One write per line keeps the lines of concurrent turns whole
+        self._file.write(line + "\n")
+
+    async def record(self, events_async, query: Optional[str] = None):
+        """Yield the events of events_async unchanged, recording each one."""
+        turn = uuid.uuid4().hex[:12]
+        start = time.monotonic()
+        self._write(json.dumps({"turn": turn, "query": query, "started_at": time.time()}, separators=(",", ":")))
+        try:
+            async for event in events_async:
+                # Events are pydantic models; dump them once, straight into the line
+                event_json = event.model_dump_json(exclude_none=True, by_alias=True)
+                self._write(f'{{"turn":"{turn}","t":{time.monotonic() - start:.4f},"event":{event_json}}}')
+                yield event
+        except Exception as e:
+            self._write(json.dumps({"turn": turn, "t": round(time.monotonic() - start, 4),
+                                    "error": str(e) or type(e).__name__}, separators=(",", ":")))
+            raise
+        finally:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+@dataclass
+class RecordedTurn:
+    """The events of one recorded turn, with their offsets in seconds."""
+    turn: str
+    query: Optional[str] = None
+    started_at: Optional[float] = None
+    events: List[Tuple[float, Event]] = field(default_factory=list)
+    # Offset and message of the failure that ended the run, if any
+    error: Optional[Tuple[float, str]] = None
+
+    @property
+    def duration(self) -> float:
+        offsets = [offset for offset, _ in self.events]
+        if self.error:
+            offsets.append(self.error[0])
+        return max(offsets, default=0.0)
+
+
+def load_recording(path: str) -> List[RecordedTurn]:
+    """Read a recording and return its turns in the order they started."""
+    turns = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            turn = turns.get(record["turn"])
+            if turn is None:
+                turn = turns[record["turn"]] = RecordedTurn(turn=record["turn"])
+            if "event" in record:
+                turn.events.append((record["t"], Event.model_validate(record["event"])))
+            elif "error" in record:
+                turn.error = (record["t"], record["error"])
+            else:
+                turn.query = record.get("query")
+                turn.started_at = record.get("started_at")
+    return list(turns.values())
+
+
+class EventReplay:
+    """
+    Async iterator over the events of a recorded turn.
+
+    With realtime each event is released at its recorded offset (divided by
+    speed); otherwise events are released as fast as they are consumed. lags
+    holds, per event, how late the consumer asked for it compared to when it
+    was released, which is the time spent processing the previous events.
+    """
+
+    def __init__(self, turn: RecordedTurn, realtime: bool = False, speed: float = 1.0):
+        self.turn = turn
+        self.realtime = realtime
+        self.speed = speed if speed > 0 else 1.0
+        self.lags: List[float] = []
+
+    def __aiter__(self):
+        return self.events()
+
+    async def events(self):
+        start = time.monotonic()
+        for offset, event in self.turn.events:
+            due = start + offset / self.speed if self.realtime else None
+            if due is not None:
+                now = time.monotonic()
+                if due > now:
+                    await asyncio.sleep(due - now)
+                self.lags.append(max(0.0, now - due))
+            yield event
+        if self.turn.error:
+            raise RecordedRunError(self.turn.error[1])
+
+
+@dataclass
+class ReplayResult:
+    """Timings of one replayed turn."""
+    turn: str
+    events: int
+    recorded_seconds: float
+    replay_seconds: float
+    max_lag: float = 0.0
+    mean_lag: float = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.replay_seconds if self.replay_seconds else 0.0
+
+
+async def replay_turn(turn: RecordedTurn, realtime: bool = False, speed: float = 1.0,
+                      shell_mode: bool = False) -> ReplayResult:
+    """Run one recorded turn through process_events and time it."""
+    replay = EventReplay(turn, realtime=realtime, speed=speed)
+    logger = ConversationLogger()
+    if turn.query:
+        logger.add_user_message(turn.query)
+    stats = ConversationStats()
+    stats.start_request()
+    start = time.monotonic()
+    try:
+        await process_events(replay.events(), ErrorRecoverySystem(), stats, logger,
+                             shell_mode=shell_mode, tool_tracker=ToolCallTracker())
+    except RecordedRunError:
+        pass
+    elapsed = time.monotonic() - start
+    lags = replay.lags
+    return ReplayResult(
+        turn=turn.turn, events=len(turn.events), recorded_seconds=turn.duration, replay_seconds=elapsed,
+        max_lag=max(lags, default=0.0), mean_lag=sum(lags) / len(lags) if lags else 0.0,
+    )
+
+
+async def replay_recording(path: str, realtime: bool = False, speed: float = 1.0, repeat: int = 1,
+                           shell_mode: bool = False) -> List[ReplayResult]:
+    """Replay every turn of a recording repeat times and print the timings."""
+    turns = load_recording(path)
+    if not turns:
+        print_status_message(f"No recorded turns in {path}", "warning", show_time=False)
+        return []
+    results = []
+    for _ in range(max(1, repeat)):
+        for turn in turns:
+            results.append(await replay_turn(turn, realtime=realtime, speed=speed, shell_mode=shell_mode))
+
+    print_section_header("Replay Benchmark", width=50)
+    mode = f"original timing x{speed:g}" if realtime else "full speed"
+    print(f"{COLOR_DIM}{path}: {len(turns)} turn(s), {mode}, {max(1, repeat)} run(s){COLOR_RESET}")
+    for result in results:
+        lag = f", lag mean {result.mean_lag * 1000:.1f}ms max {result.max_lag * 1000:.1f}ms" if realtime else ""
+        print(f"  {COLOR_CYAN}{result.turn}{COLOR_RESET}: {result.events} event(s) in {result.replay_seconds:.3f}s "
+              f"{COLOR_DIM}(recorded {result.recorded_seconds:.2f}s, {result.events_per_second:,.0f} events/s{lag}){COLOR_RESET}")
+    total_events = sum(result.events for result in results)
+    total_seconds = sum(result.replay_seconds for result in results)
+    rate = total_events / total_seconds if total_seconds else 0.0
+    print(f"{COLOR_BOLD}Total:{COLOR_RESET} {total_events} events in {total_seconds:.3f}s ({rate:,.0f} events/s)")
+    return results
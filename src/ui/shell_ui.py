@@ -1,4 +1,5 @@
 """Clean UI module for AgentSH with minimal terminal design."""
+import io
 import sys
 import time
 from typing import Optional
@@ -43,4 +44,73 @@ class ShellUI:
     def format_response(content: str):
         """Format response content with minimal styling."""
         # Just return the content as-is for clean appearance
-        return content
\ No newline at end of file
+        return content
+
+
+class InfoLineFilter(io.TextIOBase):
+    """
+    Text stream that writes through to another stream, dropping 'Info:' lines.
+
+    Output is forwarded as soon as it is known not to belong to an Info line,
+    so shell mode shows the response while it is produced instead of after
+    the whole turn. Only the start of the current line is held back until it
+    can be told apart from the 'Info:' prefix.
+    """
+
+    PREFIX = "Info:"
+
+    def __init__(self, target):
+        self._target = target
+        self._pending = ""
+        # None while the current line is undecided, else whether it is shown
+        self._show_line: Optional[bool] = None
+
+    @property
+    def target(self):
+        """The stream the filtered output is written to."""
+        return self._target
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return False
+
+    def write(self, text: str) -> int:
+        for chunk in text.splitlines(keepends=True):
+            self._write_chunk(chunk)
+        # Push completed lines through even when stdout is a pipe
+        if "\n" in text:
+            self._target.flush()
+        return len(text)
+
+    def _write_chunk(self, chunk: str):
+        ends_line = chunk.endswith("\n")
+        if self._show_line is None:
+            self._pending += chunk
+            stripped = self._pending.lstrip()
+            if len(stripped) >= len(self.PREFIX) or not self.PREFIX.startswith(stripped[:len(self.PREFIX)]):
+                self._show_line = not stripped.startswith(self.PREFIX)
+            elif ends_line:
+                # A short line such as "Info" or a blank line
+                self._show_line = True
+            if self._show_line:
+                self._target.write(self._pending)
+            if self._show_line is not None:
+                self._pending = ""
+        elif self._show_line:
+            self._target.write(chunk)
+        if ends_line:
+            self._show_line = None
+            self._pending = ""
+
+    def flush(self):
+        self._target.flush()
+
+    def close_line(self):
+        """Write out an unfinished last line that turned out not to be an Info line."""
+        if self._pending and not self._pending.lstrip().startswith(self.PREFIX):
+            self._target.write(self._pending)
+        self._pending = ""
+        self._show_line = None
+        self.flush()
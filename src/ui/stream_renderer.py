@@ -0,0 +1,114 @@
+"""
+Incremental rendering of streamed (partial) agent responses.
+
+With SSE streaming the runner yields partial events that each carry a piece of
+the answer. StreamingTextRenderer writes those pieces as they arrive and
+formats the response one line at a time with the same markdown cleanup and
+compact formatting as complete responses. On a terminal the raw text of the
+unfinished line is shown immediately and redrawn formatted once the line is
+complete; elsewhere (pipes, the shell mode filter) each line is written once
+it is complete.
+"""
+
+import math
+import shutil
+import sys
+
+from ..utils.compact_formatter import format_compact
+from ..utils.mcp_agent_utils import get_visual_length, print_section_header
+from ..utils.telegram_formatter import markdown_to_plain_text
+from .shell_ui import ShellUI
+
+
+class StreamingTextRenderer:
+    """Renders the text deltas of one streamed response."""
+
+    def __init__(self, shell_mode: bool = False):
+        self.shell_mode = shell_mode
+        self.active = False
+        # Raw text of the unfinished line, and how much of it is on screen
+        self._line = ""
+        self._shown = ""
+        self._last_blank = True
+        self._live = False
+        # Everything fed since the response started
+        self._pieces = []
+
+    @staticmethod
+    def _terminal():
+        # The shell mode filter forwards to the real stdout
+        return getattr(sys.stdout, 'target', sys.stdout)
+
+    def _start(self):
+        self.active = True
+        self._pieces = []
+        self._last_blank = True
+        if not self.shell_mode:
+            print_section_header("Agent Response", width=50)
+        else:
+            ShellUI.format_response_header("Response")
+        terminal = self._terminal()
+        self._live = bool(getattr(terminal, 'isatty', lambda: False)())
+
+    @property
+    def text(self) -> str:
+        """The text of the response so far."""
+        return "".join(self._pieces)
+
+    def _format_line(self, line: str):
+        """Return the formatted line, or None if it has nothing to show (e.g. a code fence)."""
+        if not line.strip():
+            return ""
+        cleaned = markdown_to_plain_text(line + "\n")
+        if not cleaned:
+            return None
+        formatted = format_compact(cleaned)
+        return ShellUI.format_response(formatted) if self.shell_mode else formatted
+
+    def _erase_shown(self):
+        """Move back to the start of the unfinished line and clear it."""
+        if not self._shown:
+            return
+        columns = shutil.get_terminal_size().columns or 80
+        rows = max(1, math.ceil(get_visual_length(self._shown) / columns))
+        sys.stdout.write("\r" + (f"\033[{rows - 1}A" if rows > 1 else "") + "\033[J")
+        self._shown = ""
+
+    def _complete_line(self, line: str):
+        formatted = self._format_line(line)
+        if self._live:
+            self._erase_shown()
+        if formatted is None or (formatted == "" and self._last_blank):
+            return
+        sys.stdout.write(formatted + "\n")
+        self._last_blank = formatted == ""
+
+    def feed(self, delta: str):
+        """Render the next piece of the response."""
+        if not delta:
+            return
+        if not self.active:
+            self._start()
+        self._pieces.append(delta)
+        *complete, self._line = (self._line + delta).split("\n")
+        for line in complete:
+            self._complete_line(line)
+        if self._live and self._line:
+            # Show the unfinished line right away; it is redrawn formatted when complete
+            if not self._line.startswith(self._shown):
+                self._erase_shown()
+            sys.stdout.write(self._line[len(self._shown):])
+            self._shown = self._line
+        sys.stdout.flush()
+
+    def finish(self):
+        """Complete the response, rendering a trailing unfinished line."""
+        if not self.active:
+            return
+        if self._line:
+            self._complete_line(self._line)
+        self._line = ""
+        self._shown = ""
+        self.active = False
+        print()  # Add blank line for separation
+        sys.stdout.flush()
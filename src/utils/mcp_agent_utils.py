@@ -144,8 +144,8 @@ def print_section_header(title, width=50):
     print(f"{COLOR_BG_DARK}{COLOR_BOLD}{COLOR_WHITE}{title:^{width}}{COLOR_RESET}")
     print(f"{COLOR_BG_DARK}{COLOR_CYAN}{'=' * width}{COLOR_RESET}")
 
-def print_status_message(message, status_type="info", show_time=True):
-    """Print a status message with appropriate symbol and color"""
+def print_status_message(message, status_type="info", show_time=True, file=None):
+    """Print a status message with appropriate symbol and color (to file, default sys.stdout)"""
     symbols = {
         "success": (SYMBOL_SUCCESS, COLOR_GREEN),
         "error": (SYMBOL_ERROR, COLOR_RED),
@@ -159,7 +159,7 @@ def print_status_message(message, status_type="info", show_time=True):
     symbol, color = symbols.get(status_type, (SYMBOL_INFO, COLOR_BLUE))
     timestamp = f"{COLOR_DIM}[{datetime.now().strftime('%H:%M:%S')}]{COLOR_RESET} " if show_time else ""
     
-    print(f"{timestamp}{color}{symbol} {message}{COLOR_RESET}")
+    print(f"{timestamp}{color}{symbol} {message}{COLOR_RESET}", file=file)
 
 def print_loading_animation(message="Processing", duration=1.0):
     """Show a simple loading animation"""
@@ -180,22 +180,173 @@ def print_loading_animation(message="Processing", duration=1.0):
     sys.stdout.write(f"\r{COLOR_GREEN}{SYMBOL_SUCCESS} {message} complete!{COLOR_RESET}\n")
     sys.stdout.flush()
 
+# Values counted for the size summary of a truncated preview
+PREVIEW_SUMMARY_VALUES = 100_000
+
+def _json_scalar(value, max_string_chars, on_shorten=None):
+    """Encode a JSON scalar, shortening long strings before they are escaped."""
+    if isinstance(value, str) and len(value) > max_string_chars:
+        if on_shorten:
+            on_shorten()
+        return json.dumps(value[:max_string_chars])[:-1] + f'... (+{len(value) - max_string_chars:,} chars)"'
+    try:
+        return json.dumps(value)
+    except (TypeError, ValueError):
+        return _json_scalar(str(value), max_string_chars, on_shorten)
+
+def _iter_json_lines(value, prefix, depth, suffix, indent, max_string_chars, on_shorten):
+    pad = " " * (depth * indent)
+    if isinstance(value, dict) and value:
+        yield f"{pad}{prefix}{{"
+        last = len(value) - 1
+        for i, (key, item) in enumerate(value.items()):
+            key_prefix = json.dumps(key if isinstance(key, str) else str(key)) + ": "
+            yield from _iter_json_lines(item, key_prefix, depth + 1, "," if i < last else "", indent, max_string_chars, on_shorten)
+        yield f"{pad}}}{suffix}"
+    elif isinstance(value, (list, tuple)) and value:
+        yield f"{pad}{prefix}["
+        last = len(value) - 1
+        for i, item in enumerate(value):
+            yield from _iter_json_lines(item, "", depth + 1, "," if i < last else "", indent, max_string_chars, on_shorten)
+        yield f"{pad}]{suffix}"
+    elif isinstance(value, (dict, list, tuple)):
+        yield f"{pad}{prefix}{'{}' if isinstance(value, dict) else '[]'}{suffix}"
+    else:
+        yield f"{pad}{prefix}{_json_scalar(value, max_string_chars, on_shorten)}{suffix}"
+
+def iter_json_lines(value, indent=2, max_string_chars=200, on_shorten=None):
+    """
+    Yield the lines of json.dumps(value, indent=indent) one at a time.
+
+    Nothing beyond the lines consumed is serialized, and strings longer than
+    max_string_chars are shortened (calling on_shorten, if given), so
+    previewing a huge payload stays cheap.
+    """
+    return _iter_json_lines(value, "", 0, "", indent, max_string_chars, on_shorten)
+
+def _iter_text_lines(text):
+    """Yield the lines of a string without splitting (copying) all of it."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+def payload_size(value, max_values=None):
+    """
+    Return (characters of text, number of values, complete) for a tool payload without serializing it.
+
+    With max_values the walk stops early and complete is False; the counts are then lower bounds.
+    """
+    chars = values = 0
+    stack = [value]
+    while stack:
+        if max_values is not None and values >= max_values:
+            return chars, values, False
+        item = stack.pop()
+        values += 1
+        if isinstance(item, dict):
+            chars += sum(len(key) for key in item if isinstance(key, str))
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, (str, bytes)):
+            chars += len(item)
+        else:
+            chars += 8
+    return chars, values, True
+
+def format_size(chars):
+    """Format a character count as a human-readable size, e.g. '4.8M chars'."""
+    for unit, size in (("M", 1_000_000), ("K", 1_000)):
+        if chars >= size:
+            return f"{chars / size:.1f}{unit} chars"
+    return f"{chars} chars"
+
+def _shorten_line(line, max_line_chars, on_shorten):
+    if len(line) <= max_line_chars:
+        return line
+    on_shorten()
+    return line[:max_line_chars] + f"... (+{len(line) - max_line_chars:,} chars)"
+
+def preview_lines(response_data, max_lines=5, max_chars=2000, max_line_chars=200):
+    """
+    Return (lines, truncated) for the start of a tool response.
+
+    Dicts and lists are rendered as indented JSON and strings line by line,
+    lazily, stopping after max_lines lines or max_chars characters. Strings
+    (or text lines) longer than max_line_chars are shortened once, with a
+    marker giving the characters left out. truncated is True when anything
+    was left out.
+    """
+    truncated = False
+
+    def mark_shortened():
+        nonlocal truncated
+        truncated = True
+
+    if isinstance(response_data, str):
+        stripped = response_data.lstrip()[:1]
+        if stripped in ("{", "[") and len(response_data) <= max_chars * 10:
+            # Small JSON text reads better pretty-printed
+            try:
+                response_data = json.loads(response_data)
+            except json.JSONDecodeError:
+                pass
+    if isinstance(response_data, (dict, list, tuple)):
+        # Long strings are shortened by the JSON encoder, not cut again here
+        source = iter_json_lines(response_data, max_string_chars=max_line_chars, on_shorten=mark_shortened)
+    else:
+        source = _iter_text_lines(response_data if isinstance(response_data, str) else str(response_data))
+        source = (_shorten_line(line, max_line_chars, mark_shortened) for line in source)
+    lines = []
+    used = 0
+    for line in source:
+        if len(lines) >= max_lines or used >= max_chars:
+            return lines, True
+        lines.append(line)
+        used += len(line)
+    return lines, truncated
+
+def bounded_text(response_data, max_chars=5000):
+    """Return response_data as text (str() for plain values) of at most about max_chars characters."""
+    if isinstance(response_data, str):
+        text = response_data
+    elif isinstance(response_data, (dict, list, tuple)):
+        parts = []
+        used = 0
+        for line in iter_json_lines(response_data, max_string_chars=max_chars):
+            parts.append(line)
+            used += len(line) + 1
+            if used > max_chars:
+                break
+        text = "\n".join(parts)
+    else:
+        text = str(response_data)
+    if len(text) <= max_chars:
+        return text
+    chars, _, complete = payload_size(response_data, max_values=PREVIEW_SUMMARY_VALUES)
+    return text[:max_chars] + f"\n... ({'over ' if not complete else ''}{format_size(chars)} in total)"
+
 def format_tool_response(tool_name, response_data, show_preview=True, max_preview_lines=5):
     """Format tool responses with better visual hierarchy"""
     print_section_header(f"Tool Response: {tool_name}", width=50)
     
-    if show_preview and isinstance(response_data, (dict, list)):
-        # Show a preview of large responses
-        formatted = json.dumps(response_data, indent=2)
-        lines = formatted.splitlines()
-        
-        if len(lines) > max_preview_lines:
-            print(f"{COLOR_DIM}Showing first {max_preview_lines} lines (use --full to see complete response):{COLOR_RESET}")
-            for line in lines[:max_preview_lines]:
-                print(f"{COLOR_CYAN}{line}{COLOR_RESET}")
-            print(f"{COLOR_DIM}... {len(lines) - max_preview_lines} more lines{COLOR_RESET}")
-        else:
-            pretty_print_json_string(response_data, COLOR_CYAN)
+    if show_preview:
+        # Only the previewed part of a large response is ever serialized
+        lines, truncated = preview_lines(response_data, max_lines=max_preview_lines)
+        if truncated:
+            print(f"{COLOR_DIM}Showing a shortened preview:{COLOR_RESET}")
+        for line in lines:
+            print(f"{COLOR_CYAN}{line}{COLOR_RESET}")
+        if truncated:
+            chars, values, complete = payload_size(response_data, max_values=PREVIEW_SUMMARY_VALUES)
+            over = "" if complete else "over "
+            noun = "value" if values == 1 else "values"
+            print(f"{COLOR_DIM}... {over}{format_size(chars)} of text in {over}{values:,} {noun}{COLOR_RESET}")
     else:
         pretty_print_json_string(response_data, COLOR_CYAN)
     
@@ -216,6 +367,27 @@ def print_session_stats(token_usage=None, response_time=None, conversation_lengt
         stats_text = " | ".join(stats)
         print(f"{COLOR_DIM}{stats_text}{COLOR_RESET}")
 
+def print_token_budget(breakdown):
+    """Display the token spending of a request per agent"""
+    limit = f" of {breakdown['hard_limit']:,}" if breakdown.get('hard_limit') else ""
+    print(f"{COLOR_BOLD}Token budget:{COLOR_RESET} {breakdown['used']:,}{limit} tokens in {breakdown['model_calls']} model call(s)")
+    for agent_name, usage in breakdown['agents'].items():
+        print(f"  {COLOR_CYAN}{agent_name}{COLOR_RESET}: {usage['total']:,} tokens "
+              f"{COLOR_DIM}({usage['calls']} call(s), {usage['prompt']:,} prompt / {usage['output']:,} output){COLOR_RESET}")
+    for agent_name, reason in breakdown['stopped'].items():
+        print(f"  {COLOR_YELLOW}{SYMBOL_WARNING} {agent_name} stopped: {reason}{COLOR_RESET}")
+
+def print_tool_latency(latency_stats):
+    """Display call counts and latency per tool"""
+    if not latency_stats:
+        print_status_message("No tool calls yet.", "info")
+        return
+    print(f"{COLOR_BOLD}Tool latency:{COLOR_RESET}")
+    for tool_name, stats in latency_stats.items():
+        errors = f", {stats['errors']} failed" if stats['errors'] else ""
+        print(f"  {COLOR_CYAN}{tool_name}{COLOR_RESET}: {stats['calls']} call(s){errors} "
+              f"{COLOR_DIM}(mean {stats['mean_seconds']:.2f}s, max {stats['max_seconds']:.2f}s){COLOR_RESET}")
+
 class ConversationStats:
     """Track conversation statistics"""
     def __init__(self):
@@ -0,0 +1,108 @@
+"""
+Per-task routing of sys.stdout and sys.stderr.
+
+Everything the agent shows goes through print() and sys.stdout. When one
+process answers several queries at once (the AgentSH daemon), swapping
+sys.stdout for the duration of a query would send the output of every other
+query, and of background tasks, to the same place.
+
+install_output_router() replaces sys.stdout and sys.stderr once with streams
+that write to the output selected for the current asyncio task. The
+selection lives in a ContextVar, so tasks created while it is set inherit it,
+and everything else keeps writing to the original streams. redirect_output()
+selects the output for the current task when the router is installed and
+swaps the process-wide streams otherwise, as before.
+"""
+
+import io
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class _RoutedStream(io.TextIOBase):
+    """Stand-in for sys.stdout/sys.stderr that writes to the current task's output."""
+
+    def __init__(self, name: str, default):
+        self.name = name
+        self.default = default
+        self.selected: ContextVar = ContextVar(f"{name}_output", default=None)
+
+    @property
+    def current(self):
+        """The stream the current task writes to."""
+        return self.selected.get() or self.default
+
+    @property
+    def target(self):
+        # The streaming renderer looks behind filters for the terminal
+        current = self.current
+        return getattr(current, 'target', current)
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self.current.isatty()
+
+    def write(self, text: str) -> int:
+        return self.current.write(text)
+
+    def flush(self):
+        self.current.flush()
+
+
+def install_output_router():
+    """Route sys.stdout and sys.stderr per task from now on (idempotent)."""
+    for name in ("stdout", "stderr"):
+        stream = getattr(sys, name)
+        if not isinstance(stream, _RoutedStream):
+            setattr(sys, name, _RoutedStream(name, stream))
+
+
+def current_output(name: str = "stdout"):
+    """The stream the current task's sys.stdout (or sys.stderr) writes to."""
+    stream = getattr(sys, name)
+    return stream.current if isinstance(stream, _RoutedStream) else stream
+
+
+@contextmanager
+def redirect_output(stdout, stderr=None):
+    """
+    Send the current task's stdout (and stderr, if given) to other streams for the block.
+
+    Only the current task and the tasks it starts are affected while the
+    router is installed.
+    """
+    restore = []
+    try:
+        for name, stream in (("stdout", stdout), ("stderr", stderr)):
+            if stream is None:
+                continue
+            current = getattr(sys, name)
+            if isinstance(current, _RoutedStream):
+                restore.append((current, current.selected.set(stream)))
+            else:
+                setattr(sys, name, stream)
+                restore.append((name, current))
+        yield
+    finally:
+        for owner, previous in reversed(restore):
+            if isinstance(owner, _RoutedStream):
+                owner.selected.reset(previous)
+            else:
+                setattr(sys, owner, previous)
+
+
+async def drain_output():
+    """Wait until the current task's output has been taken up, for outputs that push back (sockets)."""
+    stream = sys.stdout
+    while stream is not None:
+        if isinstance(stream, _RoutedStream):
+            stream = stream.current
+            continue
+        drain = getattr(stream, 'drain', None)
+        if drain is not None:
+            await drain()
+            return
+        stream = getattr(stream, 'target', None)
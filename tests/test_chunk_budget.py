@@ -0,0 +1,108 @@
+"""
+Request budgets of inputs larger than the context limit, with the default flags.
+
+Splitting such an input makes every chunk about a full context window, far
+more than the default sub-agent budget and, after the first chunk, the
+default request budget. The chunks must still be analyzed.
+"""
+
+import sys
+from functools import lru_cache
+from pathlib import Path
+from types import SimpleNamespace
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from src.agents.agent_config import create_all_agents
+from src.core.cli import parse_args
+from src.core.mcp_agent import chunked_request_count, configure_request_budget
+from src.core.token_manager import TokenManager
+from src.processors.chunk_map_reduce import ChunkMapReducer
+
+# Context window async_main uses for Gemini models
+GEMINI_CONTEXT_TOKENS = 1_000_000
+
+
+@lru_cache(maxsize=None)
+def large_input() -> str:
+    """About 2.2 times the context limit of text."""
+    paragraph = "The quarterly report lists revenue, costs and open risks for each region. " * 6
+    return (paragraph + "\n\n") * 30_000
+
+
+def model_call(token_manager: TokenManager, agent_name: str, call: int, prompt: str) -> bool:
+    """Run one model call through the budget callbacks; return whether it was allowed."""
+    context = SimpleNamespace(agent_name=agent_name, invocation_id=f"inv-{call}")
+    request = LlmRequest(contents=[types.Content(role='user', parts=[types.Part(text=prompt)])])
+    refused = token_manager.before_model_callback(context, request)
+    if refused is not None:
+        return False
+    # Gemini reports the exact usage of every call
+    prompt_tokens = token_manager.count_tokens(prompt)
+    response = LlmResponse(
+        content=types.Content(role='model', parts=[types.Part(text="Notes on the part. " * 400)]),
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens, candidates_token_count=2000, total_token_count=prompt_tokens + 2000
+        ),
+    )
+    token_manager.after_model_callback(context, response)
+    return True
+
+
+def plan_chunks(chunk_mode: str):
+    """Set up budgets as async_main does and split the input as the REPL does."""
+    args = parse_args(["--chunk-mode", chunk_mode])
+    token_manager = TokenManager(model_name=args.model_name, max_context_tokens=GEMINI_CONTEXT_TOKENS)
+    agents = create_all_agents(args.model_name, {}, token_manager)
+    configure_request_budget(token_manager, args, agents)
+    chunk_runner = Runner(
+        app_name='chunk_budget_test', agent=agents['chunk_analyst'], session_service=InMemorySessionService()
+    )
+    chunk_map_reducer = ChunkMapReducer(chunk_runner, "user")
+
+    message = large_input()
+    budget = token_manager.begin_request()
+    input_limit = token_manager.max_context_tokens - token_manager.safety_margin
+    assert token_manager.count_tokens_for_limit(message, input_limit) > input_limit
+    chunk_tokens = input_limit
+    if chunk_mode == "map-reduce":
+        chunk_tokens -= token_manager.count_tokens(chunk_map_reducer.map_overhead_text(message))
+    chunks = token_manager.split_large_message(message, chunk_tokens)
+    budget.scale(chunked_request_count(len(chunks), chunk_mode))
+    return token_manager, agents, chunk_map_reducer, budget, message, chunks
+
+
+def test_map_reduce_analyzes_every_chunk():
+    token_manager, agents, chunk_map_reducer, budget, message, chunks = plan_chunks("map-reduce")
+    assert len(chunks) >= 3
+    for index, chunk in enumerate(chunks):
+        prompt = chunk_map_reducer.build_map_prompt(chunk, index, len(chunks), message)
+        assert model_call(token_manager, agents['chunk_analyst'].name, index, prompt)
+    assert model_call(token_manager, agents['root'].name, len(chunks), "Combine the notes.")
+    assert not budget.stopped
+    # The chunk analyst went far past the sub-agent budget
+    assert budget.used_by(agents['chunk_analyst'].name) > 2 * budget.agent_limit
+
+
+def test_sequential_sends_every_chunk():
+    token_manager, agents, _, budget, _, chunks = plan_chunks("sequential")
+    assert len(chunks) >= 3
+    for index, chunk in enumerate(chunks):
+        assert model_call(token_manager, agents['root'].name, index, chunk)
+    assert not budget.stopped
+
+
+def test_sub_agents_keep_their_budget():
+    token_manager, agents, _, budget, _, chunks = plan_chunks("sequential")
+    # A sub-agent given a small part of the input is fine, one given a chunk is not
+    assert model_call(token_manager, agents['fetch'].name, 0, chunks[0][:100_000])
+    assert not model_call(token_manager, agents['fetch'].name, 1, chunks[1])
+    assert agents['fetch'].name in budget.stopped
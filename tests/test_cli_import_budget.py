@@ -0,0 +1,45 @@
+"""
+Startup budget of the command-line interface.
+
+main.py parses arguments (and answers --help) before the ADK stack is
+loaded, so src.core.cli must stay light. Each check runs in a fresh
+interpreter so modules imported by the test session do not hide the cost.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from src.core.cli import CLI_IMPORT_BUDGET_SECONDS, HEAVY_MODULES, parse_args
+parse_args([])
+elapsed = time.perf_counter() - start
+loaded = sorted({name for name in sys.modules for heavy in HEAVY_MODULES if name == heavy or name.startswith(heavy + ".")})
+print(json.dumps({"elapsed": elapsed, "budget": CLI_IMPORT_BUDGET_SECONDS, "loaded": loaded}))
+"""
+
+
+def run_probe():
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_cli_does_not_import_heavy_modules():
+    assert run_probe()["loaded"] == []
+
+
+def test_cli_import_within_budget():
+    # Best of three runs, so a busy machine does not fail the check
+    probes = [run_probe() for _ in range(3)]
+    elapsed = min(probe["elapsed"] for probe in probes)
+    budget = probes[0]["budget"]
+    assert elapsed < budget, (
+        f"importing src.core.cli and parsing arguments took {elapsed:.3f}s (budget {budget}s)"
+    )
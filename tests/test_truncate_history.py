@@ -0,0 +1,134 @@
+"""
+Benchmark of TokenManager.truncate_conversation_history.
+
+The ledger keeps prefix sums of per-message token counts, so a truncation
+check is O(1) and the cut is a binary search. The baseline below is the
+previous algorithm: count every message again, then walk back from the end
+inserting each kept message after the first one.
+
+Run the benchmark directly to print timings:
+
+    python tests/test_truncate_history.py [messages]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from google.genai import types
+
+from src.core.token_manager import TokenManager
+from src.core.tokenizers import EstimatorTokenizer
+
+WORDS = "the agent reads files fetches pages and answers questions about them".split()
+
+
+def build_history(messages: int, seed: int = 0):
+    """A history of messages of 5-200 words, alternating user and model turns."""
+    rng = random.Random(seed)
+    return [
+        types.Content(role="user" if i % 2 == 0 else "model", parts=[types.Part(
+            text=" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 200)))
+        )])
+        for i in range(messages)
+    ]
+
+
+def make_manager(history):
+    """
+    A TokenManager whose limit is about half of the history's tokens.
+
+    Exact counts use the byte-length estimator too, so estimated and exact
+    ledgers agree and the timings measure the truncation, not the tokenizer.
+    """
+    manager = TokenManager(exact_tokenizer=EstimatorTokenizer())
+    total = sum(manager.count_content_tokens(content) for content in history)
+    manager.max_context_tokens = total // 2 + manager.safety_margin
+    return manager
+
+
+def baseline_truncate(manager: TokenManager, history):
+    """The previous truncation: recount every message, then insert kept ones one by one."""
+    counts = [manager.count_content_tokens(content) for content in history]
+    if sum(counts) <= manager.max_context_tokens - manager.safety_margin:
+        return history
+    truncated = [history[0]]
+    remaining = manager.max_context_tokens - manager.safety_margin - counts[0]
+    for content, tokens in zip(reversed(history[1:]), reversed(counts[1:])):
+        if tokens > remaining:
+            break
+        truncated.insert(1, content)
+        remaining -= tokens
+    return truncated
+
+
+def tracked_history(manager: TokenManager, history):
+    """Feed a history through add_to_history, as the interactive loop does."""
+    conversation = []
+    for content in history:
+        manager.add_to_history(conversation, content)
+    # Count exactly, as once the history is near the limit
+    manager.should_truncate_history(conversation)
+    return conversation
+
+
+def best_of(runs: int, func, *args):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmark(messages: int = 10_000, runs: int = 3):
+    """Return (baseline seconds, should_truncate seconds, truncate seconds, same result)."""
+    history = build_history(messages)
+    manager = make_manager(history)
+    baseline_seconds, expected = best_of(runs, baseline_truncate, manager, history)
+
+    conversation = tracked_history(manager, history)
+    check_seconds, _ = best_of(runs, manager.should_truncate_history, conversation)
+    # Each run truncates a fresh copy of the same tracked history
+    truncate_seconds = None
+    for _ in range(runs):
+        conversation = tracked_history(manager, history)
+        start = time.perf_counter()
+        truncated = manager.truncate_conversation_history(conversation)
+        elapsed = time.perf_counter() - start
+        truncate_seconds = elapsed if truncate_seconds is None else min(truncate_seconds, elapsed)
+    return baseline_seconds, check_seconds, truncate_seconds, truncated == expected
+
+
+def test_truncate_keeps_the_same_messages_as_the_baseline():
+    history = build_history(2_000, seed=1)
+    manager = make_manager(history)
+    truncated = manager.truncate_conversation_history(tracked_history(manager, history))
+    assert truncated == baseline_truncate(manager, history)
+    assert truncated[0] is history[0]
+    assert manager.history_tokens <= manager.max_context_tokens - manager.safety_margin
+
+
+def test_truncate_is_much_faster_than_the_baseline():
+    baseline_seconds, check_seconds, truncate_seconds, same = run_benchmark(5_000, runs=1)
+    assert same
+    # Even with a tokenizer this cheap the speedup is over 30 times; leave a
+    # wide margin for noisy machines
+    assert truncate_seconds * 10 < baseline_seconds
+    assert check_seconds * 10 < baseline_seconds
+
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    baseline_seconds, check_seconds, truncate_seconds, same = run_benchmark(messages)
+    print(f"{messages:,} messages, limit at half the history, best of 3")
+    print(f"  baseline (recount + insert):    {baseline_seconds * 1000:9.2f} ms")
+    print(f"  should_truncate_history:        {check_seconds * 1000:9.2f} ms")
+    print(f"  truncate_conversation_history:  {truncate_seconds * 1000:9.2f} ms")
+    print(f"  same kept messages: {same}")